@@ -0,0 +1,356 @@
+"""Headless HTTP API for programmatic clients (the Streamlit UI lives in app.py).
+
+Run with:
+    uvicorn api:app --host 0.0.0.0 --port 8000
+"""
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from langchain_core.documents import Document
+from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+from rag.loader import iter_load_documents
+from rag.splitter import split_docs
+from rag.embeddings import get_embedding_stats, warmup_embeddings
+from rag.vector_store import remove_documents, sync_vector_store_streaming, update_documents
+from rag.qa_chain import get_llm, get_usage_stats
+from rag.evaluator import aevaluate
+from rag.answer_cache import get_answer_cache
+from rag.sessions import get_registry
+from rag.storage import get_storage_manager
+from rag.prewarm import get_prewarm_timings, prewarm
+from rag.logger import get_query_logger, log_query
+from rag.tracing import traced
+import asyncio
+import json
+import os
+import time
+
+load_dotenv()
+
+ANSWER_MODES = ("default", "star", "bullet")
+ANSWER_LENGTHS = ("short", "medium", "long")
+PROVIDERS = ("groq", "openai")
+
+class APIError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+def _check_auth(request):
+    # Optional shared-secret auth: set API_TOKEN to require "Authorization: Bearer <token>"
+    token = os.getenv("API_TOKEN")
+    if token and request.headers.get("authorization") != f"Bearer {token}":
+        raise APIError(401, "Missing or invalid API token")
+
+def _knowledge_base(request):
+    kb = get_registry().get(request.path_params["kb_id"])
+    if kb is None:
+        raise APIError(404, f"Unknown knowledge base: {request.path_params['kb_id']}")
+    return kb
+
+async def _json_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise APIError(400, "Request body must be JSON")
+    if not isinstance(body, dict):
+        raise APIError(400, "Request body must be a JSON object")
+    return body
+
+def _choice(body, field, choices, default):
+    value = body.get(field, default)
+    if value not in choices:
+        raise APIError(400, f"{field} must be one of: {', '.join(choices)}")
+    return value
+
+def _string(body, field, default=None):
+    value = body.get(field, default)
+    if value is not None and not isinstance(value, str):
+        raise APIError(400, f"{field} must be a string")
+    return value
+
+def _chat_history(body):
+    # Either preformatted text or [question, answer] pairs
+    history = body.get("chat_history") or []
+    if isinstance(history, str):
+        return history
+    if not isinstance(history, list) or not all(
+        isinstance(turn, list) and len(turn) == 2 and all(isinstance(part, str) for part in turn)
+        for turn in history
+    ):
+        raise APIError(400, "chat_history must be a string or a list of [question, answer] pairs")
+    return history
+
+def _top_k(body):
+    k = body.get("k", os.getenv("RETRIEVAL_K", "3"))
+    try:
+        if isinstance(k, bool) or int(k) != float(k):
+            raise ValueError
+        k = int(k)
+    except (TypeError, ValueError):
+        raise APIError(400, "k must be an integer")
+    if k < 1:
+        raise APIError(400, "k must be at least 1")
+    return k
+
+def _sources(docs, scores):
+    return [
+        {
+            "source": doc.metadata.get("source", "unknown"),
+            "content": doc.page_content,
+            "similarity": round(score, 4),
+        }
+        for doc, score in zip(docs, scores)
+    ]
+
+def _endpoint(handler):
+    async def endpoint(request):
+        try:
+            _check_auth(request)
+            return await handler(request)
+        except APIError as e:
+            return JSONResponse({"error": e.message}, status_code=e.status_code)
+    return endpoint
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+async def stats(request):
+    answer_cache = get_answer_cache()
+    return JSONResponse({
+        "knowledge_bases": len(get_registry()),
+        "embeddings": get_embedding_stats(),
+        "llm_usage": get_usage_stats(),
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+        "storage": get_storage_manager().stats(),
+        "prewarm": get_prewarm_timings(),
+        "query_log": get_query_logger().stats(),
+    })
+
+async def create_kb(request):
+    body = await _json_body(request) if await request.body() else {}
+    kb_id = _string(body, "kb_id")
+    if kb_id is not None and not kb_id.strip():
+        raise APIError(400, "kb_id must be a non-empty string")
+    try:
+        kb = await run_in_threadpool(get_registry().create, kb_id)
+    except ValueError as e:
+        raise APIError(409, str(e))
+    return JSONResponse(kb.info(), status_code=201)
+
+async def get_kb(request):
+    kb = _knowledge_base(request)
+    return JSONResponse(await run_in_threadpool(kb.info))
+
+async def delete_kb(request):
+    if not get_registry().drop(request.path_params["kb_id"]):
+        raise APIError(404, f"Unknown knowledge base: {request.path_params['kb_id']}")
+    return JSONResponse({"deleted": request.path_params["kb_id"]})
+
+@traced("ingest")
+def _ingest(kb, texts, file_jobs, replace):
+    """Load, split and embed texts and files into a knowledge base (runs in a worker thread)"""
+    errors = []
+
+    def iter_chunks():
+        for source, text in texts:
+            yield from split_docs([Document(page_content=text, metadata={"source": source})])
+        paths = [path for path, _ in file_jobs]
+        for (_, source), loaded in zip(file_jobs, iter_load_documents(paths)):
+            # Errors are only known once the (lazily parsed) chunks are consumed
+            for chunk in loaded["chunks"]:
+                chunk.metadata["source"] = source
+                yield chunk
+            if loaded["error"]:
+                errors.append({"source": source, "error": loaded["error"]})
+
+    with kb.write_lock:
+        if replace:
+            # The knowledge base ends up holding exactly these documents
+            changes = sync_vector_store_streaming(kb.vectorstore, iter_chunks())
+        else:
+            # Adds new sources and replaces re-sent ones, leaving the rest alone
+            changes = update_documents(kb.vectorstore, list(iter_chunks()))
+    return {**changes, "errors": errors}
+
+async def ingest(request):
+    """Add documents: JSON {"documents": [{"source", "text"}]} or multipart files (+ optional "text" field)"""
+    kb = _knowledge_base(request)
+    replace = request.query_params.get("replace", "false").lower() == "true"
+    storage = get_storage_manager()
+    session_id = kb.storage_session.session_id
+    texts = []
+    file_jobs = []
+    temp_dir = None
+
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            try:
+                for field, value in form.multi_items():
+                    if isinstance(value, str):
+                        if field == "text" and value.strip():
+                            texts.append(("pasted_text", value.strip()))
+                        continue
+                    name = os.path.basename(value.filename or "")
+                    if not name.endswith((".pdf", ".txt")):
+                        raise APIError(400, f"Unsupported file type: {name or field}")
+                    if temp_dir is None:
+                        temp_dir = storage.new_temp_dir(session_id)
+                    path = os.path.join(temp_dir, name)
+                    with open(path, "wb") as f:
+                        f.write(await value.read())
+                    # "cv" uploads are tagged like CV uploads in the UI
+                    file_jobs.append((path, f"CV: {name}" if field == "cv" else name))
+            finally:
+                await form.close()
+        else:
+            body = await _json_body(request)
+            documents = body.get("documents", [])
+            if not isinstance(documents, list):
+                raise APIError(400, "documents must be a list")
+            for document in documents:
+                if (not isinstance(document, dict) or not isinstance(document.get("text"), str)
+                        or not document["text"].strip()):
+                    raise APIError(400, "Each document needs a non-empty text")
+                if not isinstance(document.get("source") or "", str):
+                    raise APIError(400, "Document source must be a string")
+                texts.append((document.get("source") or "pasted_text", document["text"].strip()))
+
+        if not texts and not file_jobs:
+            raise APIError(400, "No documents provided")
+        result = await run_in_threadpool(_ingest, kb, texts, file_jobs, replace)
+    finally:
+        # Uploads are fully parsed (or rejected), so the temp copies can go now
+        if temp_dir is not None:
+            storage.release_path(temp_dir, session_id)
+    return JSONResponse(result)
+
+def _remove(kb, source):
+    with kb.write_lock:
+        return remove_documents(kb.vectorstore, source)
+
+async def delete_document(request):
+    kb = _knowledge_base(request)
+    return JSONResponse(await run_in_threadpool(_remove, kb, request.path_params["source"]))
+
+def _llm_settings(body):
+    return {
+        "provider": _choice(body, "provider", PROVIDERS, "groq"),
+        "api_key": _string(body, "api_key"),
+    }
+
+async def ask(request):
+    """Answer a question; {"stream": true} streams server-sent events"""
+    kb = _knowledge_base(request)
+    body = await _json_body(request)
+    question = (_string(body, "question") or "").strip()
+    if not question:
+        raise APIError(400, "question is required")
+    inputs = {"query": question, "chat_history": _chat_history(body)}
+    try:
+        chain = await run_in_threadpool(
+            kb.chain,
+            answer_mode=_choice(body, "answer_mode", ANSWER_MODES, "default"),
+            length=_choice(body, "length", ANSWER_LENGTHS, "medium"),
+            k=_top_k(body),
+            **_llm_settings(body),
+        )
+    except ValueError as e:
+        raise APIError(400, str(e))
+    evaluate = bool(body.get("evaluate"))
+
+    if not body.get("stream"):
+        result = await chain.acall(inputs)
+        response = {
+            "answer": result["result"],
+            "sources": _sources(result["source_documents"], result["similarity_scores"]),
+            "cached": result["cached"],
+            "usage": result["usage"],
+            "timings": result["timings"],
+        }
+        if evaluate:
+            response["evaluation"] = await _evaluate(chain, question, result)
+        _log(question, result, response.get("evaluation"))
+        return JSONResponse(response)
+
+    result = await chain.astream(inputs)
+
+    async def events():
+        yield _event("sources", {
+            "sources": _sources(result["source_documents"], result["similarity_scores"]),
+            "cached": result["cached"],
+        })
+        parts = []
+        async for token in result["stream"]:
+            parts.append(token)
+            yield _event("token", {"text": token})
+        result["result"] = "".join(parts)
+        evaluation = None
+        if evaluate:
+            evaluation = await _evaluate(chain, question, result)
+            yield _event("evaluation", evaluation)
+        _log(question, result, evaluation)
+        yield _event("done", {"usage": result["usage"], "timings": result["timings"]})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+async def _evaluate(chain, question, result):
+    context = "\n\n".join(doc.page_content for doc in result["source_documents"][:2])
+    start = time.perf_counter()
+    evaluation = await aevaluate(chain.llm, question, result["result"], context)
+    result["metrics"]["evaluation_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return evaluation
+
+def _log(question, result, evaluation):
+    log_query(
+        question=question,
+        answer=result["result"],
+        sources_count=len(result["source_documents"]),
+        answer_mode=result["metrics"]["answer_mode"],
+        evaluation=evaluation,
+        metrics=result["metrics"],
+    )
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def evaluate(request):
+    """Evaluate an answer: JSON {"question", "answer", "context"?, "provider"?, "api_key"?}"""
+    body = await _json_body(request)
+    question = (_string(body, "question") or "").strip()
+    answer = (_string(body, "answer") or "").strip()
+    if not question or not answer:
+        raise APIError(400, "question and answer are required")
+    context = _string(body, "context") or ""
+    try:
+        llm = await run_in_threadpool(get_llm, **_llm_settings(body))
+    except ValueError as e:
+        raise APIError(400, str(e))
+    return JSONResponse(await aevaluate(llm, question, answer, context))
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load the embedding model before the first ingest instead of during it;
+    # the vector backend, loaders and provider SDKs follow in the background
+    await asyncio.to_thread(warmup_embeddings, background=False)
+    prewarm()
+    yield
+
+app = Starlette(
+    routes=[
+        Route("/health", health),
+        Route("/stats", _endpoint(stats)),
+        Route("/kb", _endpoint(create_kb), methods=["POST"]),
+        Route("/kb/{kb_id}", _endpoint(get_kb), methods=["GET"]),
+        Route("/kb/{kb_id}", _endpoint(delete_kb), methods=["DELETE"]),
+        Route("/kb/{kb_id}/documents", _endpoint(ingest), methods=["POST"]),
+        Route("/kb/{kb_id}/documents/{source:path}", _endpoint(delete_document), methods=["DELETE"]),
+        Route("/kb/{kb_id}/ask", _endpoint(ask), methods=["POST"]),
+        Route("/evaluate", _endpoint(evaluate), methods=["POST"]),
+    ],
+    lifespan=lifespan,
+)
@@ -1,23 +1,32 @@
 import streamlit as st
 import os
-import tempfile
-import shutil
 import time
-import stat
-import uuid
+import html
+import re
 from pathlib import Path
 from dotenv import load_dotenv
-from rag.loader import load_document
+from rag.loader import iter_load_documents
 from rag.splitter import split_docs
-from rag.embeddings import get_embeddings
-from rag.vector_store import create_vector_store
-from rag.qa_chain import create_qa_chain, get_llm
-from rag.evaluator import evaluate_answer
+from rag.embeddings import get_embeddings, get_embedding_stats, warmup_embeddings
+from rag.vector_store import create_session_store, sync_vector_store_streaming
+from rag.qa_chain import create_qa_chain, get_llm, get_usage_stats
+from rag.evaluator import stream_evaluation, parse_evaluation, submit_evaluation
 from rag.logger import log_query, get_stats
+from rag.answer_cache import get_answer_cache
+from rag.storage import get_storage_manager
+from rag.prewarm import prewarm
+from rag.tracing import get_recent_spans, is_enabled as tracing_enabled
 
 # Load environment variables
 load_dotenv()
 
+# Heavy dependencies are imported on first use; optionally load them (and the
+# embedding model) in the background at server start instead
+if os.getenv("PREWARM", "false").lower() == "true":
+    prewarm()
+elif os.getenv("PREWARM_EMBEDDINGS", "false").lower() == "true":
+    warmup_embeddings()
+
 # Page config
 st.set_page_config(
     page_title="Interview Prep RAG Bot",
@@ -205,6 +214,16 @@ with st.sidebar:
     )
     st.session_state.enable_evaluation = enable_eval
     
+    if enable_eval:
+        eval_timing = st.radio(
+            "Evaluation Timing",
+            ["background", "on demand"],
+            index=["background", "on demand"].index(st.session_state.get("eval_timing", "background")),
+            horizontal=True,
+            help="Background: evaluate while the answer is shown | On demand: evaluate only when requested"
+        )
+        st.session_state.eval_timing = eval_timing
+    
     # Semantic Search Preview Toggle
     show_semantic = st.checkbox(
         "Show Semantic Search Details",
@@ -229,6 +248,18 @@ with st.sidebar:
         if stats["total_queries"] > 0:
             st.divider()
             st.caption(f"📊 Total queries logged: {stats['total_queries']}")
+        reclaimed_bytes = get_storage_manager().stats()["reclaimed_bytes"]
+        if reclaimed_bytes > 0:
+            st.caption(f"🧹 Disk reclaimed: {reclaimed_bytes / 1024 ** 2:.1f} MB")
+        answer_cache = get_answer_cache()
+        if answer_cache is not None and answer_cache.stats()["hits"] > 0:
+            st.caption(f"⚡ Answer cache hit rate: {answer_cache.stats()['hit_rate']:.0%}")
+        usage = get_usage_stats()
+        if usage["requests"] > 0:
+            st.caption(
+                f"🔤 Avg prompt: {usage['avg_input_tokens']:.0f} tokens "
+                f"({usage['cached_ratio']:.0%} provider-cached)"
+            )
     except:
         pass
 
@@ -253,6 +284,13 @@ if "enable_evaluation" not in st.session_state:
     st.session_state.enable_evaluation = True
 if "show_semantic_search" not in st.session_state:
     st.session_state.show_semantic_search = False
+if "eval_timing" not in st.session_state:
+    st.session_state.eval_timing = "background"
+if "last_answer" not in st.session_state:
+    st.session_state.last_answer = None
+if "storage_session" not in st.session_state:
+    # Session-scoped stores and temp dirs are released when the session ends
+    st.session_state.storage_session = get_storage_manager().open_session()
 
 # ===============================
 # 📄 Knowledge Input Section
@@ -330,97 +368,118 @@ with st.container():
 if process_clicked and (pasted_text.strip() or uploaded_files):
     with st.spinner("Processing documents..."):
             try:
-                # Close existing vectorstore if it exists
-                if st.session_state.vectorstore is not None:
-                    try:
-                        # Try to delete the persistent directory
-                        if hasattr(st.session_state.vectorstore, '_persist_directory'):
-                            persist_dir = st.session_state.vectorstore._persist_directory
-                        else:
-                            persist_dir = "db"
-                        
-                        # Clear session state first
-                        st.session_state.vectorstore = None
-                        st.session_state.qa_chain = None
-                        
-                        # Wait a moment for file handles to release
-                        time.sleep(0.5)
-                        
-                        # Try to delete the database folder
-                        if os.path.exists(persist_dir):
-                            # Use a more robust deletion method for Windows
-                            def remove_readonly(func, path, exc):
-                                os.chmod(path, stat.S_IWRITE)
-                                func(path)
-                            
-                            shutil.rmtree(persist_dir, onerror=remove_readonly)
-                            st.info("🗑️ Cleared previous documents")
-                    except Exception as e:
-                        # If deletion fails, use a new unique folder name instead
-                        st.warning(f"⚠️ Could not clear old database (using new one): {str(e)}")
-                
-                # Reset session state
+                # Reset session state (the vector store itself is updated in place)
                 st.session_state.documents_loaded = False
                 st.session_state.qa_chain = None
                 
-                all_docs = []
-                
-                # Process pasted text if provided
-                if pasted_text.strip():
-                    from langchain_core.documents import Document
-                    # Create a document from pasted text
-                    text_doc = Document(page_content=pasted_text.strip(), metadata={"source": "pasted_text"})
-                    all_docs.append(text_doc)
-                    st.success(f"✅ Loaded pasted text ({len(pasted_text)} characters)")
+                storage = get_storage_manager()
+                session_id = st.session_state.storage_session.session_id
+                temp_dirs = []
+                # (temp path, source name, label) for every file to ingest
+                file_jobs = []
                 
-                # Process uploaded files if provided
+                # Save uploaded files to a temporary directory
                 if uploaded_files:
-                    # Create temporary directory for uploaded files
-                    temp_dir = tempfile.mkdtemp()
-                    
+                    temp_dir = storage.new_temp_dir(session_id)
+                    temp_dirs.append(temp_dir)
                     for uploaded_file in uploaded_files:
-                        # Save uploaded file temporarily
                         temp_path = os.path.join(temp_dir, uploaded_file.name)
                         with open(temp_path, "wb") as f:
                             f.write(uploaded_file.getbuffer())
-                        
-                        # Load document
-                        docs = load_document(temp_path)
-                        all_docs.extend(docs)
-                        st.success(f"✅ Loaded {uploaded_file.name} ({len(docs)} pages)")
+                        # Keyed by file name so re-uploads are recognized
+                        file_jobs.append((temp_path, uploaded_file.name, uploaded_file.name))
                 
-                # Process CV if CV mode is enabled
+                # Save CV if CV mode is enabled
                 if st.session_state.get("cv_mode", False) and st.session_state.get("cv_documents", []):
-                    cv_temp_dir = tempfile.mkdtemp()
+                    cv_temp_dir = storage.new_temp_dir(session_id)
+                    temp_dirs.append(cv_temp_dir)
                     for cv_file in st.session_state.cv_documents:
                         cv_temp_path = os.path.join(cv_temp_dir, cv_file.name)
                         with open(cv_temp_path, "wb") as f:
                             f.write(cv_file.getbuffer())
-                        
-                        cv_docs = load_document(cv_temp_path)
                         # Add CV prefix to metadata
-                        for doc in cv_docs:
-                            doc.metadata["source"] = f"CV: {doc.metadata.get('source', cv_file.name)}"
-                        all_docs.extend(cv_docs)
-                        st.success(f"✅ Loaded CV: {cv_file.name} ({len(cv_docs)} pages)")
-                
-                # Split documents
-                st.info("📝 Splitting documents into chunks...")
-                chunks = split_docs(all_docs)
-                st.success(f"✅ Created {len(chunks)} chunks")
+                        file_jobs.append((cv_temp_path, f"CV: {cv_file.name}", f"CV: {cv_file.name}"))
                 
                 # Create embeddings
-                st.info("🔢 Generating embeddings...")
+                st.info("🔢 Loading embedding model...")
                 embeddings = get_embeddings()
+                embedding_stats = get_embedding_stats()
+                st.caption(
+                    f"Embedding model loaded in {embedding_stats['load_seconds']:.2f}s "
+                    f"(cache hits: {embedding_stats['cache_hits']})"
+                )
+                
+                # One vector store per session, updated in place: only new or
+                # changed documents are embedded, removed ones are deleted
+                if st.session_state.vectorstore is None:
+                    st.info("💾 Creating vector database...")
+                    vector_backend = os.getenv("VECTOR_BACKEND", "numpy")
+                    db_dir = storage.new_db_dir(session_id) if vector_backend == "chroma" else None
+                    vectorstore = create_session_store(embeddings, db_dir, vector_backend)
+                else:
+                    st.info("💾 Updating vector database...")
+                    vectorstore = st.session_state.vectorstore
+                
+                def iter_session_chunks():
+                    """Yield chunks from pasted text and files while earlier batches are embedded"""
+                    if pasted_text.strip():
+                        from langchain_core.documents import Document
+                        # Create a document from pasted text
+                        text_doc = Document(page_content=pasted_text.strip(), metadata={"source": "pasted_text"})
+                        yield from split_docs([text_doc])
+                        st.success(f"✅ Loaded pasted text ({len(pasted_text)} characters)")
+                    
+                    # Files are parsed and split in parallel; one bad file doesn't abort the batch
+                    paths = [path for path, _, _ in file_jobs]
+                    for (_, source, label), loaded in zip(file_jobs, iter_load_documents(paths)):
+                        # Single files are parsed while their chunks are consumed, so
+                        # the error and counts are only known afterwards
+                        for chunk in loaded["chunks"]:
+                            chunk.metadata["source"] = source
+                            yield chunk
+                        if loaded["error"]:
+                            if loaded["chunk_count"]:
+                                st.warning(
+                                    f"⚠️ Loaded only the first {loaded['pages']} pages of {label}: "
+                                    f"{loaded['error']}"
+                                )
+                            else:
+                                st.warning(f"⚠️ Skipped {label}: {loaded['error']}")
+                            continue
+                        st.success(
+                            f"✅ Loaded {label} ({loaded['pages']} pages, "
+                            f"{loaded['chunk_count']} chunks, {loaded['seconds']:.2f}s)"
+                        )
+                
+                st.info("📝 Loading, splitting and embedding documents...")
+                # Cache counters are process-wide; report only this ingest's share
+                cache_before = embeddings.stats() if hasattr(embeddings, "stats") else None
+                try:
+                    changes = sync_vector_store_streaming(vectorstore, iter_session_chunks())
+                finally:
+                    # Uploads are fully parsed, so the temp copies can go now
+                    for temp_dir in temp_dirs:
+                        storage.release_path(temp_dir, session_id)
                 
-                # Create vector store with unique name to avoid conflicts
-                db_name = f"db_{uuid.uuid4().hex[:8]}"
-                st.info("💾 Creating vector database...")
-                vectorstore = create_vector_store(chunks, embeddings, persist_directory=db_name)
+                total_chunks = changes["added"] + changes["unchanged"]
+                if not total_chunks:
+                    raise ValueError("No content could be loaded from the provided documents")
+                st.success(f"✅ Created {total_chunks} chunks")
+                st.caption(
+                    f"Vector store: {changes['added']} chunks added, {changes['removed']} removed, "
+                    f"{changes['unchanged']} unchanged"
+                )
+                if cache_before is not None:
+                    cache_after = embeddings.stats()
+                    st.caption(
+                        f"Embedding cache: {cache_after['hits'] - cache_before['hits']} hits, "
+                        f"{cache_after['misses'] - cache_before['misses']} misses"
+                    )
                 st.session_state.vectorstore = vectorstore
                 st.session_state.documents_loaded = True
                 # Reset chat history when new documents are loaded
                 st.session_state.chat_history = []
+                st.session_state.last_answer = None
                 
                 st.progress(100)
                 st.success("🎉 Knowledge base ready! You can now ask questions.")
@@ -429,6 +488,44 @@ if process_clicked and (pasted_text.strip() or uploaded_files):
                 st.error(f"❌ Error processing documents: {str(e)}")
                 st.exception(e)
 
+def format_answer_html(answer):
+    """Format an answer as HTML paragraphs for the answer box"""
+    answer_text = str(answer)
+    
+    # Remove markdown bold formatting (**text**) and convert to HTML bold
+    answer_text = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', answer_text)
+    
+    # Convert newlines to paragraphs for better spacing
+    paragraphs = answer_text.split('\n')
+    formatted_paragraphs = []
+    for para in paragraphs:
+        para = para.strip()
+        if para:
+            # Escape HTML but preserve our strong tags
+            para = html.escape(para)
+            # Restore strong tags after escaping
+            para = para.replace('&lt;strong&gt;', '<strong>').replace('&lt;/strong&gt;', '</strong>')
+            formatted_paragraphs.append(f'<p>{para}</p>')
+    
+    return ''.join(formatted_paragraphs)
+
+def render_evaluation(evaluation):
+    """Render evaluation scores and feedback"""
+    st.markdown("### 📊 Answer Evaluation")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Relevance", f"{evaluation['relevance']:.1f}/10")
+    with col2:
+        st.metric("Clarity", f"{evaluation['clarity']:.1f}/10")
+    with col3:
+        st.metric("STAR", f"{evaluation['star']:.1f}/10")
+    with col4:
+        st.metric("Overall", f"{evaluation['overall']:.1f}/10", 
+                delta=f"{evaluation['overall'] - 7:.1f}" if evaluation['overall'] >= 7 else None)
+    
+    st.markdown("**Feedback:**")
+    st.info(evaluation['feedback'])
+
 # Q&A Section
 if st.session_state.documents_loaded:
     st.divider()
@@ -448,7 +545,8 @@ if st.session_state.documents_loaded:
                         llm, 
                         st.session_state.vectorstore,
                         answer_mode=st.session_state.answer_mode,
-                        length=st.session_state.answer_length
+                        length=st.session_state.answer_length,
+                        k=int(os.getenv("RETRIEVAL_K", "3"))
                     )
                     st.session_state.qa_chain = qa_chain
                     st.session_state["chain_key"] = chain_key
@@ -469,6 +567,7 @@ if st.session_state.documents_loaded:
         # Clear history button
         if st.button("🗑️ Clear Chat History"):
             st.session_state.chat_history = []
+            st.session_state.last_answer = None
             st.rerun()
     
     # Question input
@@ -507,117 +606,156 @@ if st.session_state.documents_loaded:
         
         # Get answer
         if question:
-            with st.spinner("🤔 Generating answer..."):
-                try:
-                    # Build chat history context
-                    chat_context = ""
-                    if st.session_state.chat_history:
-                        recent_qas = st.session_state.chat_history[-3:]  # Last 3 Q&As
-                        chat_context = "\n".join([f"Q: {q}\nA: {a[:200]}..." for q, a in recent_qas])
+            try:
+                last_answer = st.session_state.last_answer
+                is_new_question = (
+                    last_answer is None
+                    or last_answer["question"] != question
+                    or last_answer["chain_key"] != st.session_state.get("chain_key")
+                )
+                evaluation_future = None
+                
+                if is_new_question:
+                    with st.spinner("🤔 Generating answer..."):
+                        # Last 3 Q&As; the chain fits them into its history token budget
+                        result = st.session_state.qa_chain.stream({
+                            "query": question,
+                            "chat_history": st.session_state.chat_history[-3:]
+                        })
+                        sources = result.get("source_documents", [])
+                        similarity_scores = result.get("similarity_scores", [])
+                        
+                        # Render answer tokens live as they arrive
+                        st.markdown("### 📝 Suggested Answer")
+                        answer_box = st.empty()
+                        answer = ""
+                        last_render = 0.0
+                        for token in result["stream"]:
+                            answer += token
+                            # Throttle re-renders so long answers stay cheap to draw
+                            if time.monotonic() - last_render > 0.05:
+                                answer_box.markdown(
+                                    f"<div class='answer-box'>{format_answer_html(answer)}</div>",
+                                    unsafe_allow_html=True
+                                )
+                                last_render = time.monotonic()
+                        answer_box.markdown(
+                            f"<div class='answer-box'>{format_answer_html(answer)}</div>",
+                            unsafe_allow_html=True
+                        )
+                        if result.get("cached"):
+                            st.caption("⚡ Served from answer cache")
                     
-                    # Get LLM for evaluation if needed
-                    llm_for_eval = None
-                    if st.session_state.enable_evaluation:
-                        llm_for_eval = get_llm(provider=provider, api_key=api_key)
+                    context_text = "\n\n".join([doc.page_content[:300] for doc in sources[:2]])
                     
-                    result = st.session_state.qa_chain({
-                        "query": question,
-                        "chat_history": chat_context
-                    })
-                    answer = result["result"]
-                    sources = result.get("source_documents", [])
-                    similarity_scores = result.get("similarity_scores", [])
+                    # Start evaluating as soon as the answer text is available
+                    if st.session_state.enable_evaluation and st.session_state.eval_timing == "background":
+                        llm_for_eval = get_llm(provider=provider, api_key=api_key)
+                        evaluation_started = time.perf_counter()
+                        evaluation_future = submit_evaluation(llm_for_eval, question, answer, context_text)
                     
                     # Add to chat history
                     st.session_state.chat_history.append((question, answer))
                     
-                    # Log the query
+                    # Keep the result so reruns (e.g. "Evaluate this answer") don't regenerate it
+                    last_answer = {
+                        "question": question,
+                        "chain_key": st.session_state.get("chain_key"),
+                        "answer": answer,
+                        "sources": sources,
+                        "similarity_scores": similarity_scores,
+                        "context_text": context_text,
+                        "evaluation": None,
+                        # Kept with the answer so a rerun during the wait picks it up
+                        # instead of evaluating again
+                        "evaluation_future": evaluation_future,
+                    }
+                    st.session_state.last_answer = last_answer
+                    
+                    # Log the query with its stage timings, token usage and scores; with
+                    # background evaluation the entry is written once the scores are in
+                    log_args = {
+                        "question": question,
+                        "answer": answer,
+                        "sources_count": len(sources),
+                        "answer_mode": st.session_state.answer_mode,
+                        "metrics": result.get("metrics"),
+                    }
                     try:
-                        log_query(
-                            question=question,
-                            answer=answer,
-                            sources_count=len(sources),
-                            answer_mode=st.session_state.answer_mode
-                        )
+                        if evaluation_future is not None:
+                            def log_with_evaluation(future, started=evaluation_started, log_args=log_args):
+                                if log_args["metrics"] is not None:
+                                    log_args["metrics"]["evaluation_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                                log_query(evaluation=future.result(), **log_args)
+                            evaluation_future.add_done_callback(log_with_evaluation)
+                        else:
+                            log_query(**log_args)
                     except:
                         pass
-                    
-                    # Display answer with elegant styling
+                else:
+                    answer = last_answer["answer"]
+                    sources = last_answer["sources"]
+                    similarity_scores = last_answer["similarity_scores"]
+                    evaluation_future = last_answer.get("evaluation_future")
                     st.markdown("### 📝 Suggested Answer")
-                    # Clean and format the answer
-                    import html
-                    import re
-                    answer_text = str(answer)
-                    
-                    # Remove markdown bold formatting (**text**) and convert to HTML bold
-                    answer_text = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', answer_text)
-                    
-                    # Convert newlines to paragraphs for better spacing
-                    paragraphs = answer_text.split('\n')
-                    formatted_paragraphs = []
-                    for para in paragraphs:
-                        para = para.strip()
-                        if para:
-                            # Escape HTML but preserve our strong tags
-                            para = html.escape(para)
-                            # Restore strong tags after escaping
-                            para = para.replace('&lt;strong&gt;', '<strong>').replace('&lt;/strong&gt;', '</strong>')
-                            formatted_paragraphs.append(f'<p>{para}</p>')
-                    
-                    formatted_answer = ''.join(formatted_paragraphs)
-                    
                     st.markdown(
-                        f"<div class='answer-box'>{formatted_answer}</div>",
+                        f"<div class='answer-box'>{format_answer_html(answer)}</div>",
                         unsafe_allow_html=True
                     )
-                    
-                    # Answer Evaluation
-                    if st.session_state.enable_evaluation and llm_for_eval:
-                        with st.spinner("📊 Evaluating answer quality..."):
-                            try:
-                                context_text = "\n\n".join([doc.page_content[:300] for doc in sources[:2]])
-                                evaluation = evaluate_answer(llm_for_eval, question, answer, context_text)
-                                
-                                st.markdown("### 📊 Answer Evaluation")
-                                col1, col2, col3, col4 = st.columns(4)
-                                with col1:
-                                    st.metric("Relevance", f"{evaluation['relevance']:.1f}/10")
-                                with col2:
-                                    st.metric("Clarity", f"{evaluation['clarity']:.1f}/10")
-                                with col3:
-                                    st.metric("STAR", f"{evaluation['star']:.1f}/10")
-                                with col4:
-                                    st.metric("Overall", f"{evaluation['overall']:.1f}/10", 
-                                            delta=f"{evaluation['overall'] - 7:.1f}" if evaluation['overall'] >= 7 else None)
-                                
-                                st.markdown("**Feedback:**")
-                                st.info(evaluation['feedback'])
-                            except Exception as e:
-                                st.warning(f"Evaluation unavailable: {str(e)}")
-                    
-                    # Semantic Search Preview
-                    if st.session_state.show_semantic_search and sources:
-                        st.markdown("### 🔍 Semantic Search Details")
-                        with st.expander("View Retrieved Chunks & Similarity Scores"):
-                            for i, (doc, score) in enumerate(zip(sources, similarity_scores), 1):
-                                st.markdown(f"**Chunk {i}** (Similarity: {score:.2%})")
-                                st.text(doc.page_content[:300] + "...")
-                                if doc.metadata.get("source"):
-                                    st.caption(f"Source: {doc.metadata['source']}")
-                                st.divider()
-                    
-                    # Display sources
-                    if sources:
-                        with st.expander("📚 Source Documents"):
-                            for i, doc in enumerate(sources[:3], 1):
-                                st.markdown(f"**Source {i}:**")
-                                if similarity_scores and i <= len(similarity_scores):
-                                    st.caption(f"Similarity: {similarity_scores[i-1]:.2%}")
-                                st.text(doc.page_content[:200] + "...")
-                                
-                except Exception as e:
-                    st.error(f"❌ Error generating answer: {str(e)}")
-                    st.exception(e)
+                
+                # Answer Evaluation (filled in below once the panel has something to show)
+                evaluation_panel = st.container()
+                
+                # Semantic Search Preview
+                if st.session_state.show_semantic_search and sources:
+                    st.markdown("### 🔍 Semantic Search Details")
+                    with st.expander("View Retrieved Chunks & Similarity Scores"):
+                        for i, (doc, score) in enumerate(zip(sources, similarity_scores), 1):
+                            st.markdown(f"**Chunk {i}** (Similarity: {score:.2%})")
+                            st.text(doc.page_content[:300] + "...")
+                            if doc.metadata.get("source"):
+                                st.caption(f"Source: {doc.metadata['source']}")
+                            st.divider()
+                
+                # Display sources
+                if sources:
+                    with st.expander("📚 Source Documents"):
+                        for i, doc in enumerate(sources[:3], 1):
+                            st.markdown(f"**Source {i}:**")
+                            if similarity_scores and i <= len(similarity_scores):
+                                st.caption(f"Similarity: {similarity_scores[i-1]:.2%}")
+                            st.text(doc.page_content[:200] + "...")
+                
+                if st.session_state.enable_evaluation:
+                    with evaluation_panel:
+                        try:
+                            if last_answer["evaluation"] is None and evaluation_future is not None:
+                                with st.spinner("📊 Evaluating answer quality..."):
+                                    last_answer["evaluation"] = evaluation_future.result()
+                                last_answer["evaluation_future"] = None
+                            
+                            if last_answer["evaluation"] is not None:
+                                render_evaluation(last_answer["evaluation"])
+                            elif st.button("📊 Evaluate this answer"):
+                                # Lazy mode: stream the evaluation only when asked for
+                                llm_for_eval = get_llm(provider=provider, api_key=api_key)
+                                with st.spinner("📊 Evaluating answer quality..."):
+                                    evaluation_box = st.empty()
+                                    evaluation_text = ""
+                                    for token in stream_evaluation(
+                                        llm_for_eval, question, answer, last_answer["context_text"]
+                                    ):
+                                        evaluation_text += token
+                                        evaluation_box.caption(evaluation_text)
+                                    evaluation_box.empty()
+                                last_answer["evaluation"] = parse_evaluation(evaluation_text)
+                                render_evaluation(last_answer["evaluation"])
+                        except Exception as e:
+                            st.warning(f"Evaluation unavailable: {str(e)}")
+                            
+            except Exception as e:
+                st.error(f"❌ Error generating answer: {str(e)}")
+                st.exception(e)
     else:
         st.warning("⚠️ Please enter your API key in the sidebar to ask questions.")
 else:
@@ -631,3 +769,28 @@ Built with ❤️ using <b>LangChain</b>, <b>ChromaDB</b>, and <b>Streamlit</b><
 Interview Prep RAG Bot • 2026
 </div>
 """, unsafe_allow_html=True)
+
+# Debug panel: spans from this process's ring buffer, rendered last so the
+# current run's spans are included
+if tracing_enabled():
+    with st.sidebar:
+        with st.expander("🔍 Debug: recent spans", expanded=False):
+            spans = get_recent_spans(200)
+            if spans:
+                st.dataframe(
+                    [
+                        {
+                            "start": span["start"][11:23],
+                            "span": span["name"],
+                            "ms": span["duration_ms"],
+                            "root": span["parent_id"] is None,
+                            "attrs": ", ".join(f"{key}={value}" for key, value in span["attrs"].items()),
+                            "error": span["error"] or "",
+                        }
+                        for span in reversed(spans)
+                    ],
+                    hide_index=True,
+                    use_container_width=True,
+                )
+            else:
+                st.caption("No spans recorded yet")
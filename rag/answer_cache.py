@@ -0,0 +1,136 @@
+from collections import OrderedDict
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+
+def normalize_question(question):
+    """Normalize a question so trivial variations share a cache entry"""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.strip(" ?!.")
+
+def context_fingerprint(docs, chat_history=""):
+    """Fingerprint of the retrieved context (and history) that shapes the answer"""
+    digest = hashlib.sha256()
+    for doc in docs:
+        digest.update(doc.page_content.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(chat_history.encode("utf-8"))
+    return digest.hexdigest()
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+class AnswerCache:
+    """LRU answer cache with TTL and optional near-duplicate question lookup"""
+
+    def __init__(self, max_entries=1000, ttl_seconds=3600, similarity_threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        # (answer_mode, length, fingerprint) -> keys, for near-duplicate lookups
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def get(self, question, answer_mode, length, fingerprint, query_embedding=None):
+        """Return a cached answer or None"""
+        group = (answer_mode, length, fingerprint)
+        key = (normalize_question(question),) + group
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry, now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["answer"]
+
+            if query_embedding is not None and self.similarity_threshold:
+                for other in list(self._groups.get(group, ())):
+                    candidate = self._entries[other]
+                    if self._expired(candidate, now) or candidate["embedding"] is None:
+                        continue
+                    if _cosine(query_embedding, candidate["embedding"]) >= self.similarity_threshold:
+                        self._entries.move_to_end(other)
+                        self.hits += 1
+                        self.semantic_hits += 1
+                        return candidate["answer"]
+
+            self.misses += 1
+            return None
+
+    def put(self, question, answer_mode, length, fingerprint, answer, query_embedding=None):
+        """Store an answer"""
+        group = (answer_mode, length, fingerprint)
+        key = (normalize_question(question),) + group
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "embedding": list(query_embedding) if query_embedding is not None else None,
+                "created": time.monotonic(),
+            }
+            self._entries.move_to_end(key)
+            self._groups.setdefault(group, set()).add(key)
+            self._evict(time.monotonic())
+
+    def stats(self):
+        """Get hit/miss counters and the current cache size"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+    def clear(self):
+        """Remove every cached answer"""
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def _expired(self, entry, now):
+        return self.ttl_seconds and now - entry["created"] > self.ttl_seconds
+
+    def _remove(self, key):
+        del self._entries[key]
+        group = self._groups.get(key[1:])
+        if group is not None:
+            group.discard(key)
+            if not group:
+                del self._groups[key[1:]]
+        self.evictions += 1
+
+    def _evict(self, now):
+        for key in [k for k, entry in self._entries.items() if self._expired(entry, now)]:
+            self._remove(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+def get_answer_cache():
+    """Get the process-wide answer cache (None when disabled)"""
+    global _answer_cache
+    if os.getenv("ANSWER_CACHE", "true").lower() != "true":
+        return None
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache(
+                max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+                ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+                similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+            )
+        return _answer_cache
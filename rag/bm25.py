@@ -0,0 +1,97 @@
+from collections import Counter
+import heapq
+import math
+import re
+import threading
+
+# Keeps tech tokens like "c++", "c#", "node.js" and "aws-saa" intact
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#._-]*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the "
+    "this to was were what when where which who why will with you your".split()
+)
+
+def tokenize(text):
+    """Lowercase lexical tokens used for BM25 indexing and queries"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        token = token.rstrip("._-")
+        if token and token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+class BM25Index:
+    """Okapi BM25 over an inverted index that is updated as chunks are added or removed"""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> {doc id: term frequency}
+        self._postings = {}
+        self._lengths = {}
+        self._terms = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, ids, texts):
+        """Index texts under their IDs (existing IDs are re-indexed)"""
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                self._remove(doc_id)
+                counts = Counter(tokenize(text))
+                for term, tf in counts.items():
+                    self._postings.setdefault(term, {})[doc_id] = tf
+                self._terms[doc_id] = counts
+                self._lengths[doc_id] = sum(counts.values())
+                self._total_length += self._lengths[doc_id]
+
+    def remove(self, ids):
+        """Drop IDs from the index"""
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def search(self, query, k=4):
+        """Top-k (doc id, BM25 score) pairs, best first"""
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._lengths)
+            if not n or not terms:
+                return []
+            avg_length = self._total_length / n or 1.0
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def _remove(self, doc_id):
+        counts = self._terms.pop(doc_id, None)
+        if counts is None:
+            return
+        for term in counts:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+
+def reciprocal_rank_fusion(rankings, weights=None, rrf_k=60):
+    """Fuse ranked ID lists into (id, score) pairs, best first"""
+    # score(d) = sum over rankings of weight / (rrf_k + rank of d)
+    weights = weights or [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        if not weight:
+            continue
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
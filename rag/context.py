@@ -0,0 +1,160 @@
+import hashlib
+
+# Token budgets per answer length (see get_prompt_template), for retrieved context and chat history
+CONTEXT_TOKEN_BUDGETS = {
+    "short": 500,
+    "medium": 1000,
+    "long": 1800,
+}
+HISTORY_TOKEN_BUDGETS = {
+    "short": 150,
+    "medium": 250,
+    "long": 400,
+}
+# Shortest shared text treated as splitter overlap when chunks carry no start_index
+MIN_OVERLAP_CHARS = 20
+
+def count_tokens(text):
+    """Estimate tokens (about 4 characters per token for English prose)"""
+    return (len(text) + 3) // 4
+
+def truncate_to_tokens(text, budget):
+    """Cut text to roughly `budget` tokens, on a word boundary where possible"""
+    if count_tokens(text) <= budget:
+        return text
+    cut = text[:max(budget * 4 - 3, 0)]
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "..."
+
+def _text_overlap(left, right):
+    # Length of the longest suffix of left that is a prefix of right
+    if len(left) < MIN_OVERLAP_CHARS or len(right) < MIN_OVERLAP_CHARS:
+        return 0
+    head = right[:MIN_OVERLAP_CHARS]
+    position = left.find(head, max(0, len(left) - len(right)))
+    while position != -1:
+        if right.startswith(left[position:]):
+            return len(left) - position
+        position = left.find(head, position + 1)
+    return 0
+
+def _combine(passage, start, text):
+    """Merge a chunk into a passage from the same source, or return None"""
+    if text in passage["text"]:
+        return passage["start"], passage["text"]
+    if passage["text"] in text:
+        return start, text
+
+    if start is not None and passage["start"] is not None:
+        # Positions from the splitter (add_start_index) make overlap exact
+        first, second = sorted([(passage["start"], passage["text"]), (start, text)])
+        gap = second[0] - (first[0] + len(first[1]))
+        if gap <= 0:
+            return first[0], first[1] + second[1][-gap:]
+        if gap <= 2:
+            return first[0], first[1] + "\n" + second[1]
+        return None
+
+    overlap = _text_overlap(passage["text"], text)
+    if overlap:
+        return passage["start"], passage["text"] + text[overlap:]
+    overlap = _text_overlap(text, passage["text"])
+    if overlap:
+        return start, text + passage["text"][overlap:]
+    return None
+
+def _merge_passages(passages, passage, separator_tokens):
+    """Fold same-group passages that a grown passage now overlaps or touches into it"""
+    # Returns the tokens saved. A chunk can bridge two passages (c2, then c0, then
+    # c1), which must become one contiguous passage again
+    saved = 0
+    merged_any = True
+    while merged_any:
+        merged_any = False
+        for other in passages:
+            if other is passage or other["group"] != passage["group"]:
+                continue
+            merged = _combine(passage, other["start"], other["text"])
+            if merged is None:
+                continue
+            # The merged passage takes the place of whichever came first
+            if passages.index(other) < passages.index(passage):
+                passage, other = other, passage
+            tokens = count_tokens(merged[1])
+            saved += passage["tokens"] + other["tokens"] + separator_tokens - tokens
+            passage["start"], passage["text"], passage["tokens"] = merged[0], merged[1], tokens
+            passages.remove(other)
+            merged_any = True
+            break
+    return saved
+
+def build_context(docs, budget, separator="\n\n"):
+    """Pack retrieved chunks (best first) into a context of at most `budget` tokens"""
+    # Overlapping or adjacent chunks of the same source/page are merged into
+    # one passage so the splitter's overlap isn't paid for twice. Passages keep
+    # the order of their most relevant chunk. Returns (context, docs used, tokens).
+    passages = []
+    used_docs = []
+    seen = set()
+    used = 0
+    separator_tokens = count_tokens(separator)
+    for doc in docs:
+        text = doc.page_content.strip()
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        if not text or digest in seen:
+            continue
+        seen.add(digest)
+        group = (doc.metadata.get("source"), doc.metadata.get("page"))
+        start = doc.metadata.get("start_index")
+
+        merged = None
+        for passage in passages:
+            if passage["group"] == group:
+                merged = _combine(passage, start, text)
+                if merged is not None:
+                    break
+        if merged is not None:
+            extra = count_tokens(merged[1]) - passage["tokens"]
+            if used + extra > budget:
+                continue
+            passage["start"], passage["text"] = merged
+            passage["tokens"] += extra
+            used += extra - _merge_passages(passages, passage, separator_tokens)
+            used_docs.append(doc)
+            continue
+
+        cost = count_tokens(text) + (separator_tokens if passages else 0)
+        if used + cost > budget:
+            if passages:
+                continue
+            # Always keep something from the best chunk
+            text = truncate_to_tokens(text, budget)
+            cost = count_tokens(text)
+        passages.append({"group": group, "start": start, "text": text, "tokens": count_tokens(text)})
+        used += cost
+        used_docs.append(doc)
+
+    return separator.join(passage["text"] for passage in passages), used_docs, used
+
+def format_history(turns, budget, answer_chars=200):
+    """Format recent (question, answer) turns, newest kept first, within `budget` tokens"""
+    if isinstance(turns, str):
+        # Already formatted: keep the most recent part
+        if count_tokens(turns) <= budget:
+            return turns
+        return "..." + turns[-budget * 4:]
+    lines = []
+    used = 0
+    for question, answer in reversed(list(turns)):
+        answer = answer if len(answer) <= answer_chars else answer[:answer_chars] + "..."
+        entry = f"Q: {question}\nA: {answer}"
+        cost = count_tokens(entry) + 1
+        if used + cost > budget:
+            if not lines:
+                lines.append(truncate_to_tokens(entry, budget))
+            break
+        lines.append(entry)
+        used += cost
+    return "\n".join(reversed(lines))
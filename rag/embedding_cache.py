@@ -0,0 +1,130 @@
+from langchain_core.embeddings import Embeddings
+from array import array
+from pathlib import Path
+import hashlib
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = Path("cache")
+DEFAULT_MAX_ENTRIES = 200_000
+
+def chunk_key(model_name, text):
+    """Content address for a chunk embedded by a given model"""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with a persistent, size-bounded LRU cache on disk"""
+
+    def __init__(self, embeddings, model_name, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.path = Path(path) if path else CACHE_DIR / "embeddings.sqlite3"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    def embed_documents(self, texts):
+        """Embed documents, only sending uncached chunks to the model"""
+        keys = [chunk_key(self.model_name, text) for text in texts]
+        vectors = self._lookup(keys)
+
+        # Embed each distinct missing text once
+        unique = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                unique.setdefault(key, text)
+        if unique:
+            new_vectors = self.embeddings.embed_documents(list(unique.values()))
+            fresh = dict(zip(unique.keys(), new_vectors))
+            self._store(fresh)
+            vectors.update(fresh)
+
+        # Repeats of a text embedded in this call count as hits, like later calls would
+        with self._lock:
+            self.hits += len(texts) - len(unique)
+            self.misses += len(unique)
+        return [list(vectors[key]) for key in keys]
+
+    def embed_query(self, text):
+        """Embed a query (queries are not cached)"""
+        return self.embeddings.embed_query(text)
+
+    def stats(self):
+        """Get hit/miss counters and the current cache size"""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "entries": size,
+                "max_entries": self.max_entries,
+            }
+
+    def clear(self):
+        """Remove every cached embedding"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def _lookup(self, keys):
+        found = {}
+        if not keys:
+            return found
+        now = time.time()
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, vectors):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in vectors.items()],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = size - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
@@ -1,7 +1,296 @@
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
+from rag.embedding_cache import CachedEmbeddings
+from rag.tracing import current_span, span, traced
+from concurrent.futures import Future
+import numpy as np
+import os
+import queue
+import threading
+import time
 
-def get_embeddings():
-    """Get HuggingFace embeddings model"""
-    return HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# Torch intra-op threads for the whole process (0 = all cores)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) or os.cpu_count()
+# How long the coalescer waits for more requests before encoding a partial batch
+EMBEDDING_COALESCE_MS = float(os.getenv("EMBEDDING_COALESCE_MS", "5"))
+# torch: full precision | int8: dynamically quantized torch | onnx / onnx-int8: ONNX Runtime
+EMBEDDING_BACKENDS = ("torch", "int8", "onnx", "onnx-int8")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+
+class BatchedEncoder(Embeddings):
+    """Batched encoder that merges concurrent embed calls into shared model batches"""
+
+    def __init__(self, model, batch_size=EMBEDDING_BATCH_SIZE, coalesce_ms=EMBEDDING_COALESCE_MS):
+        self.model = model
+        self.batch_size = batch_size
+        self.coalesce_seconds = coalesce_ms / 1000
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="embedding-coalescer", daemon=True)
+        self._worker.start()
+
+    def encode(self, texts):
+        """Encode texts to a normalized float32 array of shape (len(texts), dim)"""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        future = Future()
+        # Includes waiting for the coalescing window and for batches ahead of this one
+        with span("encode", texts=len(texts)):
+            self._queue.put((texts, future))
+            return future.result()
+
+    def embed_documents(self, texts):
+        """Embed documents"""
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text):
+        """Embed a query"""
+        return self.encode([text])[0].tolist()
+
+    def stats(self):
+        """Get request/batch counters"""
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_texts": round(self.texts / self.batches, 1) if self.batches else 0.0,
+        }
+
+    @traced("encode_batch")
+    def _encode_now(self, texts):
+        # Runs on the coalescer thread for several callers at once, so it is a
+        # trace of its own (and profiled like a request when TRACE_PROFILE_MS is set)
+        current_span().set(texts=len(texts))
+        vectors = self.model.client.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def _run(self):
+        # A single worker owns the model, so concurrent sessions never
+        # oversubscribe cores with parallel encode calls
+        while True:
+            pending = [self._queue.get()]
+            count = len(pending[0][0])
+            deadline = time.monotonic() + self.coalesce_seconds
+            while count < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(request)
+                count += len(request[0])
+
+            texts = [text for request_texts, _ in pending for text in request_texts]
+            try:
+                vectors = self._encode_now(texts)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            self.requests += len(pending)
+            self.batches += 1
+            self.texts += len(texts)
+            offset = 0
+            for request_texts, future in pending:
+                future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+# One embedding model per process, shared by every Streamlit session
+_models = {}
+_encoders = {}
+_cached_models = {}
+_models_lock = threading.Lock()
+_warmup_thread = None
+_stats = {
+    "loads": 0,
+    "load_seconds": 0.0,
+    "cache_hits": 0,
+}
+
+@traced("get_embeddings")
+def get_embeddings(model_name=DEFAULT_MODEL_NAME, use_cache=None, backend=None):
+    """Get HuggingFace embeddings model (loaded once per process)"""
+    backend = backend or EMBEDDING_BACKEND
+    current_span().set(model=model_name, backend=backend)
+    if use_cache is None:
+        use_cache = os.getenv("EMBEDDING_CACHE", "true").lower() == "true"
+    if not use_cache:
+        return _get_encoder(model_name, backend)
+
+    key = (model_name, backend)
+    cached = _cached_models.get(key)
+    if cached is not None:
+        _stats["cache_hits"] += 1
+    else:
+        model = _get_encoder(model_name, backend)
+        with _models_lock:
+            cached = _cached_models.get(key)
+            if cached is None:
+                cached = CachedEmbeddings(
+                    model,
+                    # Other backends' vectors differ slightly, so they get their own cache namespace
+                    model_name if backend == "torch" else f"{model_name}@{backend}",
+                    path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+                    max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000")),
+                )
+                _cached_models[key] = cached
+    return cached
+
+def _get_encoder(model_name, backend):
+    key = (model_name, backend)
+    encoder = _encoders.get(key)
+    if encoder is None:
+        model = _get_model(model_name, backend)
+        with _models_lock:
+            encoder = _encoders.get(key)
+            if encoder is None:
+                encoder = BatchedEncoder(model)
+                _encoders[key] = encoder
+    return encoder
+
+def _load_model(model_name, backend):
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unsupported embedding backend: {backend}")
+
+    model_kwargs = {}
+    if backend in ("onnx", "onnx-int8"):
+        # ONNX Runtime via sentence-transformers (needs optimum[onnxruntime])
+        model_kwargs["backend"] = "onnx"
+        if backend == "onnx-int8":
+            model_kwargs["model_kwargs"] = {
+                "file_name": os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+            }
+    # Pulls in sentence-transformers, transformers and torch, so only on first use
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    try:
+        model = HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs=model_kwargs,
+            encode_kwargs={
+                "batch_size": EMBEDDING_BATCH_SIZE,
+                "normalize_embeddings": True,
+            }
+        )
+    except TypeError as e:
+        if "backend" not in model_kwargs:
+            raise
+        # SentenceTransformer only accepts backend= from 3.2 on
+        raise RuntimeError(
+            f"EMBEDDING_BACKEND={backend} needs sentence-transformers>=3.2 "
+            "(pip install -U 'sentence-transformers>=3.2')"
+        ) from e
+    if backend == "int8":
+        import torch
+        # Dynamic int8 quantization of the transformer's Linear layers
+        torch.quantization.quantize_dynamic(
+            model.client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    return model
+
+def _get_model(model_name, backend="torch"):
+    key = (model_name, backend)
+    model = _models.get(key)
+    if model is not None:
+        _stats["cache_hits"] += 1
+        return model
+
+    with _models_lock:
+        # Another thread may have loaded the model while we waited
+        model = _models.get(key)
+        if model is not None:
+            _stats["cache_hits"] += 1
+            return model
+
+        start = time.perf_counter()
+        try:
+            import torch
+            torch.set_num_threads(EMBEDDING_THREADS)
+        except ImportError:
+            pass
+        model = _load_model(model_name, backend)
+        _stats["loads"] += 1
+        _stats["load_seconds"] += time.perf_counter() - start
+        _models[key] = model
+        return model
+
+def warmup_embeddings(model_name=DEFAULT_MODEL_NAME, background=True, backend=None):
+    """Load the embedding model ahead of the first ingest"""
+    global _warmup_thread
+    backend = backend or EMBEDDING_BACKEND
+    if (model_name, backend) in _models:
+        return None
+    if not background:
+        _get_model(model_name, backend)
+        return None
+
+    with _models_lock:
+        if _warmup_thread is not None and _warmup_thread.is_alive():
+            return _warmup_thread
+        _warmup_thread = threading.Thread(
+            target=_get_model,
+            args=(model_name, backend),
+            name="embeddings-warmup",
+            daemon=True,
+        )
+        _warmup_thread.start()
+        return _warmup_thread
+
+def get_embedding_stats():
+    """Get embedding model load time, cache hit, batching and chunk cache counters"""
+    return {
+        "loaded_models": [f"{name} ({backend})" for name, backend in _models],
+        "loads": _stats["loads"],
+        "load_seconds": round(_stats["load_seconds"], 3),
+        "cache_hits": _stats["cache_hits"],
+        "encoder": {f"{name} ({backend})": encoder.stats() for (name, backend), encoder in _encoders.items()},
+        "chunk_cache": {f"{name} ({backend})": cached.stats() for (name, backend), cached in _cached_models.items()},
+    }
+
+def compare_backends(texts, backends=EMBEDDING_BACKENDS, model_name=DEFAULT_MODEL_NAME,
+                     reference="torch"):
+    """Compare embedding backends against a reference: cosine parity, throughput and load time"""
+    texts = list(texts)
+    results = {}
+    reference_vectors = None
+    for backend in [reference] + [b for b in backends if b != reference]:
+        start = time.perf_counter()
+        try:
+            model = _load_model(model_name, backend)
+        except Exception as e:
+            results[backend] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        load_seconds = time.perf_counter() - start
+
+        encoder = BatchedEncoder(model, coalesce_ms=0)
+        encoder.encode(texts[:8])  # warm up kernels before timing
+        start = time.perf_counter()
+        vectors = encoder.encode(texts)
+        seconds = time.perf_counter() - start
+
+        result = {
+            "load_seconds": round(load_seconds, 3),
+            "texts_per_second": round(len(texts) / seconds, 1) if seconds else 0.0,
+            "dimension": int(vectors.shape[1]),
+        }
+        if backend == reference:
+            reference_vectors = vectors
+        elif reference_vectors is not None:
+            # Vectors are normalized, so the row-wise dot product is the cosine
+            cosines = np.einsum("ij,ij->i", vectors, reference_vectors)
+            result["mean_cosine"] = round(float(cosines.mean()), 5)
+            result["min_cosine"] = round(float(cosines.min()), 5)
+        results[backend] = result
+    return results
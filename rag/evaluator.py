@@ -1,10 +1,15 @@
-from langchain_core.prompts import PromptTemplate
-from langchain_core.messages import HumanMessage
+from rag.llm_utils import ainvoke_llm, invoke_llm, stream_llm
+from rag.tracing import traced
+from concurrent.futures import ThreadPoolExecutor
+import os
 
-def evaluate_answer(llm, question, answer, context=""):
-    """Evaluate answer quality and provide feedback"""
-    
-    evaluation_prompt = """You are an expert interview coach evaluating an interview answer. Rate the answer on three criteria (0-10 scale) and provide specific feedback.
+# Shared pool so evaluations run alongside answer rendering
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("EVALUATION_WORKERS", "4")),
+    thread_name_prefix="evaluator",
+)
+
+EVALUATION_PROMPT = """You are an expert interview coach evaluating an interview answer. Rate the answer on three criteria (0-10 scale) and provide specific feedback.
 
 Question: {question}
 
@@ -28,77 +33,97 @@ OVERALL_SCORE: [Average of three scores, rounded to 1 decimal]
 
 Be specific and actionable in your feedback."""
 
+def build_evaluation_prompt(question, answer, context=""):
+    """Build the evaluation prompt for an answer"""
+    return EVALUATION_PROMPT.format(
+        question=question,
+        answer=answer,
+        context=context[:500] if context else "No context provided"
+    )
+
+def parse_evaluation(response_text):
+    """Parse scores and feedback out of an evaluation response"""
+    scores = {
+        "relevance": 0,
+        "clarity": 0,
+        "star": 0,
+        "overall": 0,
+        "feedback": ""
+    }
+    
+    lines = response_text.split('\n')
+    feedback_lines = []
+    in_feedback = False
+    
+    for line in lines:
+        line = line.strip()
+        if line.startswith("SCORE_RELEVANCE:"):
+            try:
+                scores["relevance"] = float(line.split(":")[1].strip())
+            except:
+                pass
+        elif line.startswith("SCORE_CLARITY:"):
+            try:
+                scores["clarity"] = float(line.split(":")[1].strip())
+            except:
+                pass
+        elif line.startswith("SCORE_STAR:"):
+            try:
+                scores["star"] = float(line.split(":")[1].strip())
+            except:
+                pass
+        elif line.startswith("OVERALL_SCORE:"):
+            try:
+                scores["overall"] = float(line.split(":")[1].strip())
+            except:
+                pass
+        elif line.startswith("FEEDBACK:"):
+            in_feedback = True
+            feedback_lines.append(line.replace("FEEDBACK:", "").strip())
+        elif in_feedback and line:
+            feedback_lines.append(line)
+    
+    scores["feedback"] = "\n".join(feedback_lines) if feedback_lines else "Evaluation completed."
+    
+    # Calculate overall if not provided
+    if scores["overall"] == 0:
+        scores["overall"] = round((scores["relevance"] + scores["clarity"] + scores["star"]) / 3, 1)
+    
+    return scores
+
+def evaluation_error(e):
+    """Evaluation result reported when the LLM call fails"""
+    return {
+        "relevance": 0,
+        "clarity": 0,
+        "star": 0,
+        "overall": 0,
+        "feedback": f"Error during evaluation: {str(e)}"
+    }
+
+@traced("evaluate_answer")
+def evaluate_answer(llm, question, answer, context=""):
+    """Evaluate answer quality and provide feedback"""
     try:
-        prompt = evaluation_prompt.format(
-            question=question,
-            answer=answer,
-            context=context[:500] if context else "No context provided"
-        )
-        
-        if hasattr(llm, 'invoke'):
-            messages = [HumanMessage(content=prompt)]
-            response = llm.invoke(messages)
-            if hasattr(response, 'content'):
-                response_text = response.content
-            else:
-                response_text = str(response)
-        else:
-            response_text = str(llm(prompt))
-        
-        # Parse the response
-        scores = {
-            "relevance": 0,
-            "clarity": 0,
-            "star": 0,
-            "overall": 0,
-            "feedback": ""
-        }
-        
-        lines = response_text.split('\n')
-        feedback_lines = []
-        in_feedback = False
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith("SCORE_RELEVANCE:"):
-                try:
-                    scores["relevance"] = float(line.split(":")[1].strip())
-                except:
-                    pass
-            elif line.startswith("SCORE_CLARITY:"):
-                try:
-                    scores["clarity"] = float(line.split(":")[1].strip())
-                except:
-                    pass
-            elif line.startswith("SCORE_STAR:"):
-                try:
-                    scores["star"] = float(line.split(":")[1].strip())
-                except:
-                    pass
-            elif line.startswith("OVERALL_SCORE:"):
-                try:
-                    scores["overall"] = float(line.split(":")[1].strip())
-                except:
-                    pass
-            elif line.startswith("FEEDBACK:"):
-                in_feedback = True
-                feedback_lines.append(line.replace("FEEDBACK:", "").strip())
-            elif in_feedback and line:
-                feedback_lines.append(line)
-        
-        scores["feedback"] = "\n".join(feedback_lines) if feedback_lines else "Evaluation completed."
-        
-        # Calculate overall if not provided
-        if scores["overall"] == 0:
-            scores["overall"] = round((scores["relevance"] + scores["clarity"] + scores["star"]) / 3, 1)
-        
-        return scores
-        
+        prompt = build_evaluation_prompt(question, answer, context)
+        return parse_evaluation(invoke_llm(llm, prompt))
     except Exception as e:
-        return {
-            "relevance": 0,
-            "clarity": 0,
-            "star": 0,
-            "overall": 0,
-            "feedback": f"Error during evaluation: {str(e)}"
-        }
+        return evaluation_error(e)
+
+@traced("aevaluate")
+async def aevaluate(llm, question, answer, context=""):
+    """Async evaluate_answer for concurrent requests"""
+    try:
+        prompt = build_evaluation_prompt(question, answer, context)
+        return parse_evaluation(await ainvoke_llm(llm, prompt))
+    except Exception as e:
+        return evaluation_error(e)
+
+def stream_evaluation(llm, question, answer, context=""):
+    """Yield evaluation tokens as they arrive (parse the joined text with parse_evaluation)"""
+    prompt = build_evaluation_prompt(question, answer, context)
+    yield from stream_llm(llm, prompt)
+
+def submit_evaluation(llm, question, answer, context=""):
+    """Start evaluating an answer in the background and return a Future"""
+    return _executor.submit(evaluate_answer, llm, question, answer, context)
@@ -0,0 +1,98 @@
+from langchain_core.messages import HumanMessage
+from rag.tracing import traced
+import asyncio
+import os
+import weakref
+
+# Event loop -> {provider: semaphore}; asyncio semaphores belong to one loop
+_limiters = weakref.WeakKeyDictionary()
+
+def message_text(message):
+    """Extract text from a chat message, message chunk or plain string"""
+    if hasattr(message, 'content'):
+        return message.content if isinstance(message.content, str) else str(message.content)
+    return str(message)
+
+def message_usage(message):
+    """Token usage reported with a chat message or stream chunk (zeros when absent)"""
+    usage = getattr(message, 'usage_metadata', None) or {}
+    cached = (usage.get('input_token_details') or {}).get('cache_read')
+    if cached is None:
+        # Providers that only report OpenAI-style usage in the response metadata
+        token_usage = (getattr(message, 'response_metadata', None) or {}).get('token_usage') or {}
+        cached = (token_usage.get('prompt_tokens_details') or {}).get('cached_tokens')
+    return {
+        'input_tokens': usage.get('input_tokens', 0) or 0,
+        'output_tokens': usage.get('output_tokens', 0) or 0,
+        'cached_tokens': cached or 0,
+    }
+
+def _add_usage(usage, message):
+    if usage is not None:
+        for key, value in message_usage(message).items():
+            usage[key] = usage.get(key, 0) + value
+
+@traced("llm.invoke")
+def invoke_llm(llm, prompt, usage=None):
+    """Run a single prompt through the LLM and return the full text (token counts are added to usage)"""
+    if hasattr(llm, 'invoke'):
+        # For ChatGroq/ChatOpenAI, use HumanMessage format
+        message = llm.invoke([HumanMessage(content=prompt)])
+        _add_usage(usage, message)
+        return message_text(message)
+    # Fallback for string-based LLMs
+    return str(llm(prompt))
+
+def stream_llm(llm, prompt, usage=None):
+    """Yield text tokens from the LLM as they arrive (token counts are added to usage)"""
+    if hasattr(llm, 'stream'):
+        for chunk in llm.stream([HumanMessage(content=prompt)]):
+            # Usage arrives once, on the final chunk
+            _add_usage(usage, chunk)
+            text = message_text(chunk)
+            if text:
+                yield text
+    else:
+        # Models without streaming support return everything at once
+        yield invoke_llm(llm, prompt, usage)
+
+def llm_provider(llm):
+    """Provider name used to group LLM calls for concurrency limits"""
+    name = type(llm).__name__.lower()
+    for provider in ('groq', 'openai'):
+        if provider in name:
+            return provider
+    return name
+
+def llm_limiter(llm):
+    """Semaphore capping concurrent async calls to this LLM's provider on the running loop"""
+    limiters = _limiters.setdefault(asyncio.get_running_loop(), {})
+    provider = llm_provider(llm)
+    if provider not in limiters:
+        # e.g. LLM_MAX_CONCURRENCY_GROQ overrides LLM_MAX_CONCURRENCY for Groq
+        limit = os.getenv(f'LLM_MAX_CONCURRENCY_{provider.upper()}') or os.getenv('LLM_MAX_CONCURRENCY', '8')
+        limiters[provider] = asyncio.Semaphore(int(limit))
+    return limiters[provider]
+
+@traced("llm.ainvoke")
+async def ainvoke_llm(llm, prompt, usage=None):
+    """Async invoke_llm, waiting for a provider slot first"""
+    async with llm_limiter(llm):
+        if hasattr(llm, 'ainvoke'):
+            message = await llm.ainvoke([HumanMessage(content=prompt)])
+            _add_usage(usage, message)
+            return message_text(message)
+        # Sync-only LLMs run in a worker thread
+        return await asyncio.to_thread(invoke_llm, llm, prompt, usage)
+
+async def astream_llm(llm, prompt, usage=None):
+    """Async stream_llm; the provider slot is held until the stream ends"""
+    async with llm_limiter(llm):
+        if hasattr(llm, 'astream'):
+            async for chunk in llm.astream([HumanMessage(content=prompt)]):
+                _add_usage(usage, chunk)
+                text = message_text(chunk)
+                if text:
+                    yield text
+        else:
+            yield await asyncio.to_thread(invoke_llm, llm, prompt, usage)
@@ -1,22 +1,155 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.document_loaders import TextLoader
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from rag.tracing import current_span, disable as disable_tracing, traced
+import multiprocessing
 import os
+import threading
+import time
 
 def load_pdf(path):
     """Load PDF document"""
+    # Document loaders are imported on first use to keep app startup fast
+    from langchain_community.document_loaders import PyPDFLoader
     loader = PyPDFLoader(path)
     return loader.load()
 
 def load_text(path):
     """Load text document"""
+    from langchain_community.document_loaders import TextLoader
     loader = TextLoader(path)
     return loader.load()
 
+@traced("load_document")
 def load_document(path):
     """Load document based on file extension"""
+    current_span().set(file=os.path.basename(path))
     if path.endswith('.pdf'):
         return load_pdf(path)
     elif path.endswith('.txt'):
         return load_text(path)
     else:
         raise ValueError(f"Unsupported file type: {path}")
+
+def iter_document(path):
+    """Yield pages of a document one at a time"""
+    from langchain_community.document_loaders import PyPDFLoader, TextLoader
+    if path.endswith('.pdf'):
+        yield from PyPDFLoader(path).lazy_load()
+    elif path.endswith('.txt'):
+        yield from TextLoader(path).lazy_load()
+    else:
+        raise ValueError(f"Unsupported file type: {path}")
+
+def load_and_split(path, split=True, chunk_size=500, chunk_overlap=100):
+    """Load (and optionally split) one file, capturing timing and errors"""
+    # Only the page count is returned: page text would be pickled back from
+    # the worker a second time next to the chunks
+    from rag.splitter import split_docs
+    start = time.perf_counter()
+    try:
+        documents = load_document(path)
+        chunks = split_docs(documents, chunk_size, chunk_overlap) if split else documents
+        pages, error = len(documents), None
+    except Exception as e:
+        chunks, pages, error = [], 0, f"{type(e).__name__}: {e}"
+    return {
+        "path": path,
+        "chunks": chunks,
+        "pages": pages,
+        "chunk_count": len(chunks),
+        "error": error,
+        "seconds": time.perf_counter() - start,
+    }
+
+def stream_and_split(path, split=True, chunk_size=500, chunk_overlap=100):
+    """Like load_and_split, but "chunks" is a generator that parses the file page by page"""
+    # pages, chunk_count, error and seconds are only final once the chunks are
+    # consumed; chunks from pages before a parse error are still yielded
+    from rag.splitter import iter_split_docs
+    result = {"path": path, "chunks": None, "pages": 0, "chunk_count": 0, "error": None, "seconds": 0.0}
+
+    def pages():
+        for page in iter_document(path):
+            result["pages"] += 1
+            yield page
+
+    def chunks():
+        start = time.perf_counter()
+        try:
+            for chunk in iter_split_docs(pages(), chunk_size, chunk_overlap) if split else pages():
+                result["chunk_count"] += 1
+                yield chunk
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            result["seconds"] = time.perf_counter() - start
+
+    result["chunks"] = chunks()
+    return result
+
+# Worker processes are started once and reused for later uploads
+_pool = None
+_pool_lock = threading.Lock()
+
+def _pool_workers():
+    return int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=_pool_workers(),
+                # spawn: forking a multi-threaded server process is unsafe
+                mp_context=multiprocessing.get_context("spawn"),
+                # Spans recorded in workers would never reach this process's exporters
+                initializer=disable_tracing,
+            )
+        return _pool
+
+def iter_load_documents(paths, split=True, chunk_size=500, chunk_overlap=100):
+    """Yield one load result per path, in input order, as soon as each is ready"""
+    # Consume each result's "chunks" before reading its counts or error: serially
+    # loaded files are parsed lazily (see stream_and_split)
+    global _pool
+    paths = list(paths)
+    # A pool only pays off when there is PDF parsing to spread across cores;
+    # otherwise pages are parsed, split and embedded one at a time
+    if len(paths) <= 1 or not any(path.endswith('.pdf') for path in paths):
+        for path in paths:
+            yield stream_and_split(path, split, chunk_size, chunk_overlap)
+        return
+
+    # Only a few files are parsed ahead of the consumer, so parsed results don't
+    # pile up here while earlier ones are still being embedded: memory is bounded
+    # by the largest few files rather than the whole upload
+    in_flight = _pool_workers()
+    pending = deque()
+    submitted = 0
+    done = 0
+    try:
+        pool = _get_pool()
+        while done < len(paths):
+            while submitted < len(paths) and len(pending) < in_flight:
+                pending.append(pool.submit(load_and_split, paths[submitted], split, chunk_size, chunk_overlap))
+                submitted += 1
+            result = pending.popleft().result()
+            done += 1
+            yield result
+    except Exception:
+        for future in pending:
+            future.cancel()
+        # A broken pool (e.g. a worker was killed) falls back to serial loading
+        with _pool_lock:
+            _pool = None
+        for path in paths[done:]:
+            yield load_and_split(path, split, chunk_size, chunk_overlap)
+
+def load_documents(paths, split=True, chunk_size=500, chunk_overlap=100):
+    """Load and split files in parallel, returning one result per path in input order"""
+    results = []
+    for result in iter_load_documents(paths, split, chunk_size, chunk_overlap):
+        # Reading the chunks first also settles the counts of lazily loaded files
+        chunks = list(result["chunks"])
+        results.append({**result, "chunks": chunks})
+    return results
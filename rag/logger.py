@@ -1,13 +1,401 @@
+import atexit
+import gzip
 import json
 import os
+import queue
+import re
+import shutil
+import socket
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 
 LOG_DIR = Path("logs")
 LOG_DIR.mkdir(exist_ok=True)
+STATS_INDEX_FILE = "stats_index.json"
 
-def log_query(question, answer, sources_count=0, answer_mode="default", evaluation=None):
-    """Log query and answer for monitoring"""
+def _open_log(path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+class StatsIndex:
+    """Per-file line counts of the query logs, updated by scanning only appended bytes"""
+
+    def __init__(self, log_dir=LOG_DIR, prefix="queries"):
+        self.log_dir = Path(log_dir)
+        self.path = self.log_dir / STATS_INDEX_FILE
+        self.patterns = (f"{prefix}_*.jsonl", f"{prefix}_*.jsonl.gz")
+        # file name -> {"lines", "offset", "size", "mtime"}
+        self._files = {}
+        self._total = 0
+        self._days = 0
+        self._names = ()
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Read the persisted index (a missing or corrupt one is rebuilt by refresh())"""
+        files = self._read()
+        with self._lock:
+            self._files = files
+            self._recount()
+
+    def save(self):
+        """Persist the index if it changed, merged with what other processes saved"""
+        with self._lock:
+            if not self._dirty:
+                return
+        # Several processes may share the log directory: take entries they counted
+        # further than this one, so the saved index never goes backwards for their files
+        saved = self._read()
+        existing = {name for name in saved if (self.log_dir / name).exists()}
+        with self._lock:
+            for name in existing:
+                entry, mine = saved[name], self._files.get(name)
+                if mine is None or (entry["mtime"], entry["offset"]) > (mine["mtime"], mine["offset"]):
+                    self._files[name] = entry
+            self._recount()
+            data = json.dumps({"files": self._files})
+            self._dirty = False
+        # Written atomically via a per-process temp file. Two concurrent saves can
+        # still lose one side's newest counts, which is harmless: every entry carries
+        # the size and mtime it was counted at, so a stale one is rescanned from its offset
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                files = json.load(f)["files"]
+            if not all({"lines", "offset", "size", "mtime"} <= entry.keys() for entry in files.values()):
+                raise ValueError
+            return files
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return {}
+
+    def snapshot(self):
+        """Current totals in the get_stats() format; O(1)"""
+        with self._lock:
+            return {
+                "total_queries": self._total,
+                "total_days": self._days,
+                "files": list(self._names),
+            }
+
+    def refresh(self):
+        """Pick up new, grown, rotated and deleted log files"""
+        paths = [path for pattern in self.patterns for path in self.log_dir.glob(pattern)]
+        names = {path.name for path in paths}
+        for path in paths:
+            self.update_file(path)
+        with self._lock:
+            for name in [name for name in self._files if name not in names]:
+                del self._files[name]
+                self._dirty = True
+            self._recount()
+
+    def update_file(self, path):
+        """Count lines appended to one file since it was last indexed"""
+        path = Path(path)
+        try:
+            stat = path.stat()
+        except OSError:
+            return
+        with self._lock:
+            entry = self._files.get(path.name)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return
+        if entry and path.suffix != ".gz" and stat.st_size >= entry["offset"]:
+            # Append-only: scan just the new bytes
+            lines, offset = entry["lines"], entry["offset"]
+        else:
+            # New, compressed or truncated/replaced file: count from the start
+            lines, offset = 0, 0
+        try:
+            if path.suffix == ".gz":
+                with _open_log(path) as f:
+                    lines = sum(1 for _ in f)
+                offset = stat.st_size
+            else:
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    for block in iter(lambda: f.read(1024 * 1024), b""):
+                        lines += block.count(b"\n")
+                        offset += len(block)
+        except OSError:
+            return
+        with self._lock:
+            self._files[path.name] = {"lines": lines, "offset": offset, "size": stat.st_size, "mtime": stat.st_mtime}
+            self._dirty = True
+            self._recount()
+
+    def moved(self, old, new):
+        """Carry a file's count over when it is renamed or compressed, instead of rescanning"""
+        new = Path(new)
+        try:
+            stat = new.stat()
+        except OSError:
+            return
+        with self._lock:
+            entry = self._files.pop(Path(old).name, None)
+            if entry is None:
+                return
+            self._files[new.name] = {
+                "lines": entry["lines"], "offset": stat.st_size, "size": stat.st_size, "mtime": stat.st_mtime
+            }
+            self._dirty = True
+            self._recount()
+
+    def _recount(self):
+        self._total = sum(entry["lines"] for entry in self._files.values())
+        # Rotated files of the same day count as one day
+        self._days = len({name.split(".")[0] for name in self._files})
+        self._names = tuple(sorted(self._files))
+
+class QueryLogger:
+    """Buffered JSONL logger: callers enqueue, a background thread batches writes to disk"""
+
+    def __init__(self, log_dir=LOG_DIR, max_queue=10000, batch_size=256, flush_interval=1.0,
+                 fsync_interval=5.0, max_bytes=50 * 1024 ** 2, compress=True, block_timeout=0.0,
+                 index_refresh_interval=60.0, prefix="queries"):
+        self.log_dir = Path(log_dir)
+        # File name prefix: <prefix>_<date>.<writer>.jsonl (other record types get their own directory)
+        self.prefix = prefix
+        # Each process writes (and rotates) only its own file, so processes sharing
+        # the directory (app and API) never rename or gzip a file another one has open
+        self.writer_id = f"{re.sub(r'[^A-Za-z0-9-]', '-', socket.gethostname())}-{os.getpid()}"
+        # Usage stats, kept current by the writer so readers never scan the logs
+        self.index = StatsIndex(self.log_dir, prefix)
+        self.index_refresh_interval = index_refresh_interval
+        self._last_refresh = None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.compress = compress
+        # How long log() may wait for queue space before dropping (0 = never wait)
+        self.block_timeout = block_timeout
+        self.counters = {
+            "queued": 0,
+            "written": 0,
+            "dropped": 0,
+            "batches": 0,
+            "fsyncs": 0,
+            "rotations": 0,
+            "errors": 0,
+        }
+        self.last_error = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_date = None
+        self._last_fsync = time.monotonic()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="query-logger", daemon=True)
+        self._thread.start()
+
+    def log(self, entry):
+        """Queue an entry; returns False if it was dropped because the queue is full"""
+        try:
+            if self.block_timeout > 0:
+                # Backpressure: slow the caller down a little before giving up
+                self._queue.put(entry, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(entry)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("queued")
+        return True
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far is written and synced to disk"""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Flush and stop the writer thread"""
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        """Get write/drop counters and the current queue depth"""
+        with self._lock:
+            return {
+                **self.counters,
+                "queue_size": self._queue.qsize(),
+                "last_error": self.last_error,
+            }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _run(self):
+        self._refresh_index()
+        while True:
+            batch, markers, stop = [], [], False
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._maybe_fsync(force=False)
+                if time.monotonic() - self._last_refresh >= self.index_refresh_interval:
+                    # Picks up files written by other processes sharing the log directory
+                    self._refresh_index()
+                continue
+            # Drain whatever else is already queued, up to one batch
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(batch)
+            self._maybe_fsync(force=bool(markers) or stop)
+            for marker in markers:
+                marker.set()
+            if stop:
+                self._close_file(compress=False)
+                self.index.save()
+                return
+
+    def _write(self, batch):
+        try:
+            self._rotate_if_needed()
+            self._file.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in batch))
+            self._file.flush()
+            self._count("written", len(batch))
+            self._count("batches")
+            self.index.update_file(self._file.name)
+        except Exception as e:
+            self._count("errors")
+            self._count("dropped", len(batch))
+            self.last_error = f"{type(e).__name__}: {e}"
+            self._close_file(compress=False)
+
+    def _refresh_index(self):
+        try:
+            self.index.refresh()
+            self.index.save()
+        except Exception as e:
+            self._count("errors")
+            self.last_error = f"{type(e).__name__}: {e}"
+        self._last_refresh = time.monotonic()
+
+    def _maybe_fsync(self, force):
+        if self._file is None:
+            return
+        if not force and time.monotonic() - self._last_fsync < self.fsync_interval:
+            return
+        try:
+            os.fsync(self._file.fileno())
+            self._count("fsyncs")
+            self.index.save()
+        except Exception as e:
+            self._count("errors")
+            self.last_error = f"{type(e).__name__}: {e}"
+        self._last_fsync = time.monotonic()
+
+    def _path(self, date):
+        return self.log_dir / f"{self.prefix}_{date}.{self.writer_id}.jsonl"
+
+    def _rotate_if_needed(self):
+        date = datetime.now().strftime('%Y-%m-%d')
+        if self._file is not None and self._file_date != date:
+            # New day: the previous day's file is complete
+            self._close_file(compress=self.compress)
+            self._count("rotations")
+        elif self._file is not None and self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._close_file(compress=False)
+            self._roll(self._path(date))
+            self._count("rotations")
+        if self._file is None:
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+            self._file = open(self._path(date), "a", encoding="utf-8")
+            self._file_date = date
+
+    def _roll(self, path):
+        # queries_<date>.<writer>.jsonl -> queries_<date>.<writer>.<n>.jsonl, keeping the active name free
+        n = 1
+        while any(self.log_dir.glob(f"{path.stem}.{n}.jsonl*")):
+            n += 1
+        rolled = path.with_name(f"{path.stem}.{n}.jsonl")
+        path.rename(rolled)
+        self.index.moved(path, rolled)
+        if self.compress:
+            self._gzip(rolled)
+
+    def _close_file(self, compress):
+        if self._file is None:
+            return
+        path = Path(self._file.name)
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        except Exception as e:
+            self._count("errors")
+            self.last_error = f"{type(e).__name__}: {e}"
+        self._file = None
+        self._file_date = None
+        if compress:
+            self._gzip(path)
+
+    def _gzip(self, path):
+        try:
+            with open(path, "rb") as src, gzip.open(f"{path}.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            path.unlink()
+            self.index.moved(path, f"{path}.gz")
+        except Exception as e:
+            self._count("errors")
+            self.last_error = f"{type(e).__name__}: {e}"
+
+_logger = None
+_logger_lock = threading.Lock()
+
+def get_query_logger():
+    """Get the process-wide query logger (flushed at interpreter exit)"""
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            _logger = QueryLogger(
+                max_queue=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+                flush_interval=float(os.getenv("LOG_FLUSH_SECONDS", "1")),
+                fsync_interval=float(os.getenv("LOG_FSYNC_SECONDS", "5")),
+                max_bytes=int(float(os.getenv("LOG_MAX_MB", "50")) * 1024 ** 2),
+                compress=os.getenv("LOG_COMPRESS", "true").lower() == "true",
+                block_timeout=float(os.getenv("LOG_BLOCK_MS", "0")) / 1000,
+            )
+            atexit.register(_logger.close)
+        return _logger
+
+def log_query(question, answer, sources_count=0, answer_mode="default", evaluation=None, metrics=None):
+    """Log query and answer for monitoring (queued; written in the background)"""
+    # metrics: the chain result's "metrics" (stage timings in ms, token usage,
+    # similarity scores, cache hits), optionally with "evaluation_ms"
     log_entry = {
         "timestamp": datetime.now().isoformat(),
         "question": question,
@@ -15,38 +403,13 @@ def log_query(question, answer, sources_count=0, answer_mode="default", evaluati
         "sources_count": sources_count,
         "answer_mode": answer_mode,
         "evaluation": evaluation,
+        "metrics": metrics,
     }
-    
-    log_file = LOG_DIR / f"queries_{datetime.now().strftime('%Y-%m-%d')}.jsonl"
-    
-    try:
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
-    except Exception as e:
-        # Silently fail if logging doesn't work
-        pass
+    return get_query_logger().log(log_entry)
 
 def get_stats():
-    """Get usage statistics"""
+    """Get usage statistics (from the incrementally maintained stats index)"""
     try:
-        stats = {
-            "total_queries": 0,
-            "total_days": 0,
-            "files": []
-        }
-        
-        if LOG_DIR.exists():
-            log_files = list(LOG_DIR.glob("queries_*.jsonl"))
-            stats["total_days"] = len(log_files)
-            stats["files"] = [f.name for f in log_files]
-            
-            for log_file in log_files:
-                try:
-                    with open(log_file, "r", encoding="utf-8") as f:
-                        stats["total_queries"] += len(f.readlines())
-                except:
-                    pass
-        
-        return stats
-    except:
+        return get_query_logger().index.snapshot()
+    except Exception:
         return {"total_queries": 0, "total_days": 0, "files": []}
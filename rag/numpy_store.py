@@ -0,0 +1,230 @@
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from rag.bm25 import BM25Index
+from pathlib import Path
+import json
+import threading
+import uuid
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.jsonl"
+
+class NumpyVectorStore(VectorStore):
+    """In-process vector index: a contiguous float32 matrix with exact cosine top-k"""
+
+    def __init__(self, embedding, initial_capacity=256):
+        self._embedding = embedding
+        self._matrix = None
+        self._size = 0
+        self._initial_capacity = initial_capacity
+        self._ids = []
+        self._texts = []
+        self._metadatas = []
+        self._index = {}
+        # Lexical (BM25) index over the same chunks, kept in step with every write
+        self.lexical_index = BM25Index()
+        self._lock = threading.RLock()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def __len__(self):
+        return self._size
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        """Embed and add texts; existing IDs are replaced"""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [uuid.uuid4().hex for _ in texts]
+        vectors = self._normalize(self._embed_documents(texts))
+
+        with self._lock:
+            self._reserve(len(texts), vectors.shape[1])
+            for text, metadata, doc_id, vector in zip(texts, metadatas, ids, vectors):
+                row = self._index.get(doc_id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._index[doc_id] = row
+                    self._ids.append(doc_id)
+                    self._texts.append(text)
+                    self._metadatas.append(dict(metadata))
+                else:
+                    self._texts[row] = text
+                    self._metadatas[row] = dict(metadata)
+                self._matrix[row] = vector
+            self.lexical_index.add(ids, texts)
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        """Delete rows by ID"""
+        if not ids:
+            return True
+        with self._lock:
+            rows = {self._index[doc_id] for doc_id in ids if doc_id in self._index}
+            if not rows:
+                return True
+            self.lexical_index.remove(ids)
+            keep = [row for row in range(self._size) if row not in rows]
+            self._matrix = np.ascontiguousarray(self._matrix[keep], dtype=np.float32)
+            self._size = len(keep)
+            self._ids = [self._ids[row] for row in keep]
+            self._texts = [self._texts[row] for row in keep]
+            self._metadatas = [self._metadatas[row] for row in keep]
+            self._index = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        return True
+
+    def get(self, ids=None, where=None, limit=None, include=None, **kwargs):
+        """Chroma-style get: filter by IDs and/or exact metadata matches"""
+        include = ["documents", "metadatas"] if include is None else include
+        with self._lock:
+            if ids is not None:
+                rows = [self._index[doc_id] for doc_id in ids if doc_id in self._index]
+            else:
+                rows = range(self._size)
+            if where:
+                rows = [
+                    row for row in rows
+                    if all(self._metadatas[row].get(key) == value for key, value in where.items())
+                ]
+            rows = list(rows)[:limit] if limit else list(rows)
+            result = {"ids": [self._ids[row] for row in rows]}
+            if "documents" in include:
+                result["documents"] = [self._texts[row] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [dict(self._metadatas[row]) for row in rows]
+            return result
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, **kwargs):
+        """Exact top-k by cosine; scores are cosine distances (0 = identical)"""
+        query = self._normalize(np.asarray([embedding], dtype=np.float32))[0]
+        # Snapshot under the lock, search outside it so concurrent readers
+        # (e.g. sessions sharing one base index) don't serialize on the matmul
+        with self._lock:
+            size, matrix = self._size, self._matrix
+            ids, texts, metadatas = self._ids, self._texts, self._metadatas
+        if size == 0:
+            return []
+        similarities = matrix[:size] @ query
+        k = min(k, size)
+        # argpartition finds the top-k in linear time; only those k get sorted
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [
+            (
+                Document(page_content=texts[row], metadata=dict(metadatas[row]), id=ids[row]),
+                float(1.0 - similarities[row]),
+            )
+            for row in top
+        ]
+
+    def distances_by_id(self, ids, embedding):
+        """Cosine distances from the query to the stored rows of the given IDs (unknown IDs are left out)"""
+        # Scores keyword-only hits for hybrid search without embedding their text again
+        query = self._normalize(np.asarray([embedding], dtype=np.float32))[0]
+        with self._lock:
+            known = [doc_id for doc_id in ids if doc_id in self._index]
+            rows = [self._index[doc_id] for doc_id in known]
+            matrix = self._matrix
+        if not rows:
+            return {}
+        similarities = matrix[rows] @ query
+        return {doc_id: float(1.0 - similarity) for doc_id, similarity in zip(known, similarities)}
+
+    def lexical_search(self, query, k=4):
+        """Top-k by BM25, returning (document, score) pairs"""
+        hits = self.lexical_index.search(query, k)
+        with self._lock:
+            return [
+                (
+                    Document(
+                        page_content=self._texts[self._index[doc_id]],
+                        metadata=dict(self._metadatas[self._index[doc_id]]),
+                        id=doc_id,
+                    ),
+                    score,
+                )
+                for doc_id, score in hits
+                if doc_id in self._index
+            ]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        """Search by query text, returning (document, cosine distance) pairs"""
+        return self.similarity_search_by_vector_with_relevance_scores(
+            self._embedding.embed_query(query), k=k
+        )
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        """Search by embedding"""
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k)]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        """Search by query text"""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine distance -> relevance in [0, 1]
+        return lambda distance: 1.0 - distance / 2
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        """Build an index from texts"""
+        store = cls(embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    def save(self, path):
+        """Save vectors (.npy) and records (.jsonl) to a directory"""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            matrix = self._matrix[:self._size] if self._matrix is not None else np.empty((0, 0), np.float32)
+            np.save(path / VECTORS_FILE, matrix)
+            with open(path / RECORDS_FILE, "w", encoding="utf-8") as f:
+                for doc_id, text, metadata in zip(self._ids, self._texts, self._metadatas):
+                    f.write(json.dumps({"id": doc_id, "text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+
+    @classmethod
+    def load(cls, path, embedding, mmap=True):
+        """Load a saved index; with mmap the vectors stay on disk until written to"""
+        path = Path(path)
+        store = cls(embedding)
+        matrix = np.load(path / VECTORS_FILE, mmap_mode="r" if mmap else None)
+        with open(path / RECORDS_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                store._ids.append(record["id"])
+                store._texts.append(record["text"])
+                store._metadatas.append(record["metadata"])
+        store._matrix = matrix
+        store._size = len(store._ids)
+        store._index = {doc_id: row for row, doc_id in enumerate(store._ids)}
+        store.lexical_index.add(store._ids, store._texts)
+        return store
+
+    def _embed_documents(self, texts):
+        # Batched encoders return float32 arrays directly; others return lists
+        if hasattr(self._embedding, "encode"):
+            return np.asarray(self._embedding.encode(texts), dtype=np.float32)
+        return np.asarray(self._embedding.embed_documents(texts), dtype=np.float32)
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32, copy=False)
+
+    def _reserve(self, extra, dim):
+        needed = self._size + extra
+        if self._matrix is not None and needed <= self._matrix.shape[0] and self._matrix.flags.writeable:
+            return
+        capacity = max(self._initial_capacity, needed, 2 * (self._matrix.shape[0] if self._matrix is not None else 0))
+        matrix = np.zeros((capacity, dim), dtype=np.float32)
+        if self._size:
+            # Copies a memory-mapped (read-only) matrix into memory on first write
+            matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
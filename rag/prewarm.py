@@ -0,0 +1,58 @@
+import importlib
+import os
+import threading
+import time
+
+_thread = None
+_lock = threading.Lock()
+_timings = {}
+
+def _step(name, func):
+    start = time.perf_counter()
+    try:
+        func()
+        _timings[name] = round(time.perf_counter() - start, 3)
+    except Exception as e:
+        # Prewarming is best effort; the real first use reports the error
+        _timings[name] = f"failed: {type(e).__name__}: {e}"
+
+def _import(*modules):
+    return lambda: [importlib.import_module(module) for module in modules]
+
+def _warm_embeddings():
+    from rag.embeddings import warmup_embeddings
+    warmup_embeddings(background=False)
+
+def _warm_vector_backend():
+    from rag.embeddings import get_embeddings
+    from rag.vector_store import load_base_index
+    if os.getenv("VECTOR_BACKEND", "numpy") == "chroma":
+        importlib.import_module("langchain_community.vectorstores")
+        importlib.import_module("chromadb")
+    base_index_dir = os.getenv("BASE_INDEX_DIR")
+    if base_index_dir and os.path.isdir(base_index_dir):
+        load_base_index(base_index_dir, get_embeddings())
+
+def _run():
+    _step("embeddings", _warm_embeddings)
+    _step("vector_backend", _warm_vector_backend)
+    _step("document_loaders", _import("langchain_community.document_loaders", "langchain_text_splitters", "pypdf"))
+    _step("llm_providers", _import("langchain_groq", "langchain_openai"))
+
+def prewarm(background=True):
+    """Load the embedding model, vector backend, loaders and provider SDKs ahead of first use"""
+    # Everything here is otherwise imported lazily on first use; call this at
+    # server start so the first user doesn't pay for it
+    global _thread
+    if not background:
+        _run()
+        return None
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name="prewarm", daemon=True)
+            _thread.start()
+        return _thread
+
+def get_prewarm_timings():
+    """Seconds spent on each prewarm step so far (or the error it hit)"""
+    return dict(_timings)
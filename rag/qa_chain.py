@@ -1,47 +1,173 @@
 from langchain_core.prompts import PromptTemplate
-from langchain_groq import ChatGroq
-from langchain_openai import ChatOpenAI
+from rag.llm_utils import ainvoke_llm, astream_llm, invoke_llm, stream_llm
+from rag.answer_cache import context_fingerprint, get_answer_cache
+from rag.bm25 import reciprocal_rank_fusion
+from rag.context import CONTEXT_TOKEN_BUDGETS, HISTORY_TOKEN_BUDGETS, build_context, format_history
+from rag.tracing import current_span, span, traced, use_span
+from types import MappingProxyType
+import asyncio
+import hashlib
+import httpx
+import numpy as np
 import os
+import threading
+import time
 
-def get_llm(provider="groq", api_key=None, model_name=None):
-    """Get LLM instance"""
+# Long-lived LLM clients shared across questions and sessions
+LLM_POOL_IDLE_SECONDS = float(os.getenv("LLM_POOL_IDLE_SECONDS", "900"))
+_llm_pool = {}
+_llm_pool_lock = threading.Lock()
+_llm_pool_stats = {
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0,
+}
+
+def _pool_key(provider, model_name, api_key, temperature):
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    return (provider, model_name, key_hash, temperature)
+
+def _http_client():
+    """HTTP client with keep-alive connections reused between requests"""
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=20,
+            max_keepalive_connections=10,
+            keepalive_expiry=LLM_POOL_IDLE_SECONDS,
+        ),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+
+def _evict_idle_llms(now):
+    # Only the pool's reference is dropped: chains built earlier may still hold the
+    # LLM, so its client is never closed here. Idle connections already expire after
+    # keepalive_expiry, and the client is freed once the last chain lets go of it.
+    for key, entry in list(_llm_pool.items()):
+        if now - entry["last_used"] > LLM_POOL_IDLE_SECONDS:
+            del _llm_pool[key]
+            _llm_pool_stats["evictions"] += 1
+
+def _build_llm(provider, api_key, model_name, temperature, http_client):
+    # Provider SDKs are imported on first use; each costs up to a second at startup
     if provider == "groq":
-        api_key = api_key or os.getenv("GROQ_API_KEY")
-        model_name = model_name or "llama-3.1-8b-instant"
+        from langchain_groq import ChatGroq
         return ChatGroq(
             groq_api_key=api_key,
             model_name=model_name,
-            temperature=0.7
+            temperature=temperature,
+            http_client=http_client
         )
     elif provider == "openai":
-        api_key = api_key or os.getenv("OPENAI_API_KEY")
-        model_name = model_name or "gpt-3.5-turbo"
+        from langchain_openai import ChatOpenAI
         return ChatOpenAI(
             openai_api_key=api_key,
             model_name=model_name,
-            temperature=0.7
+            temperature=temperature,
+            http_client=http_client,
+            # Report token usage on the final streamed chunk
+            stream_usage=True
         )
     else:
         raise ValueError(f"Unsupported provider: {provider}")
 
-def get_prompt_template(answer_mode="default", length="medium"):
-    """Get prompt template based on answer mode"""
-    
-    base_template = """You are an expert interview preparation assistant. Your role is to help candidates prepare for job interviews by providing structured, role-specific answers based on the job description and interview materials provided.
+def get_llm(provider="groq", api_key=None, model_name=None, temperature=0.7):
+    """Get LLM instance (pooled per provider, model, API key and temperature)"""
+    if provider == "groq":
+        api_key = api_key or os.getenv("GROQ_API_KEY")
+        model_name = model_name or "llama-3.1-8b-instant"
+    elif provider == "openai":
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        model_name = model_name or "gpt-3.5-turbo"
+    else:
+        raise ValueError(f"Unsupported provider: {provider}")
+
+    key = _pool_key(provider, model_name, api_key, temperature)
+    now = time.monotonic()
+    with _llm_pool_lock:
+        _evict_idle_llms(now)
+        entry = _llm_pool.get(key)
+        if entry is not None:
+            _llm_pool_stats["hits"] += 1
+            entry["last_used"] = now
+            return entry["llm"]
+
+        http_client = _http_client()
+        try:
+            llm = _build_llm(provider, api_key, model_name, temperature, http_client)
+        except Exception:
+            http_client.close()
+            raise
+        _llm_pool_stats["misses"] += 1
+        _llm_pool[key] = {
+            "llm": llm,
+            "http_client": http_client,
+            "last_used": now,
+        }
+        return llm
+
+def get_llm_pool_stats():
+    """Get LLM client pool size and hit/miss/eviction counters"""
+    with _llm_pool_lock:
+        return {
+            "clients": len(_llm_pool),
+            **_llm_pool_stats,
+        }
 
-Use the following context from the job description and interview materials to answer the question. Structure your answer professionally and clearly.
+# Prompt token usage across all chains, to measure prompt size and provider cache hits
+_usage_stats = {
+    "requests": 0,
+    "input_tokens": 0,
+    "cached_tokens": 0,
+    "output_tokens": 0,
+}
+_usage_lock = threading.Lock()
+
+def record_usage(usage):
+    """Add one LLM call's token usage to the process-wide totals"""
+    if not usage.get("input_tokens"):
+        # Provider didn't report usage; counting it would skew the averages
+        return
+    with _usage_lock:
+        _usage_stats["requests"] += 1
+        for key in ("input_tokens", "cached_tokens", "output_tokens"):
+            _usage_stats[key] += usage.get(key, 0)
+
+def get_usage_stats():
+    """Get LLM token totals, per-request averages and the share of input tokens served from provider caches"""
+    with _usage_lock:
+        stats = dict(_usage_stats)
+    requests = stats["requests"]
+    stats["avg_input_tokens"] = round(stats["input_tokens"] / requests, 1) if requests else 0.0
+    stats["avg_output_tokens"] = round(stats["output_tokens"] / requests, 1) if requests else 0.0
+    stats["cached_ratio"] = round(stats["cached_tokens"] / stats["input_tokens"], 3) if stats["input_tokens"] else 0.0
+    return stats
+
+# Hybrid retrieval: dense and BM25 candidates fused with reciprocal rank fusion
+HYBRID_DENSE_WEIGHT = float(os.getenv("HYBRID_DENSE_WEIGHT", "1.0"))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Static instructions come first and the per-request context/question last, so
+# every request with the same mode and length shares an identical prompt
+# prefix that provider-side prompt caching can reuse
+BASE_TEMPLATE = """You are an expert interview preparation assistant. Your role is to help candidates prepare for job interviews by providing structured, role-specific answers based on the job description and interview materials provided.
+
+Structure your answer professionally and clearly.
+
+{format_instructions}
+
+Use the following context from the job description and interview materials to answer the question.
 
 Context:
 {context}
 
 Question: {question}
 
-{format_instructions}
-
 Answer:"""
-    
-    format_instructions_map = {
-        "star": """Provide your answer using the STAR method (Situation, Task, Action, Result):
+
+FORMAT_INSTRUCTIONS = MappingProxyType({
+    "star": """Provide your answer using the STAR method (Situation, Task, Action, Result):
 - **Situation**: Set the context
 - **Task**: Describe what needed to be done
 - **Action**: Explain what you did
@@ -51,142 +177,428 @@ Ensure your answer:
 1. Is specific to the role and company mentioned in the context
 2. Includes quantifiable results/metrics
 3. Demonstrates relevant skills and experiences""",
-        
-        "bullet": """Provide your answer using clear bullet points:
+
+    "bullet": """Provide your answer using clear bullet points:
 - Use concise, impactful statements
 - Each bullet should highlight a key point
 - Include specific examples from the context
 - Demonstrate relevant skills and experiences""",
-        
-        "default": """Provide a well-structured answer that:
+
+    "default": """Provide a well-structured answer that:
 1. Is specific to the role and company mentioned in the context
 2. Uses clear bullet points or the STAR method (Situation, Task, Action, Result) when appropriate
 3. Demonstrates relevant skills and experiences
 4. Is concise but comprehensive"""
-    }
-    
-    length_instructions = {
-        "short": "Keep your answer brief and to the point (2-3 sentences or 3-4 bullet points).",
-        "medium": "Provide a comprehensive answer with adequate detail.",
-        "long": "Provide a detailed, thorough answer with extensive examples and explanations."
-    }
-    
-    format_instruction = format_instructions_map.get(answer_mode, format_instructions_map["default"])
-    length_instruction = length_instructions.get(length, "")
-    
+})
+
+LENGTH_INSTRUCTIONS = MappingProxyType({
+    "short": "Keep your answer brief and to the point (2-3 sentences or 3-4 bullet points).",
+    "medium": "Provide a comprehensive answer with adequate detail.",
+    "long": "Provide a detailed, thorough answer with extensive examples and explanations."
+})
+
+def _render_template(answer_mode, length):
+    format_instruction = FORMAT_INSTRUCTIONS.get(answer_mode, FORMAT_INSTRUCTIONS["default"])
+    length_instruction = LENGTH_INSTRUCTIONS.get(length, "")
     if length_instruction:
         format_instruction = f"{format_instruction}\n\n{length_instruction}"
-    
-    return base_template.replace("{format_instructions}", format_instruction)
-
-def create_qa_chain(llm, vectorstore, answer_mode="default", length="medium"):
-    """Create RAG QA chain with custom prompt"""
-    prompt_template = get_prompt_template(answer_mode, length)
+    return BASE_TEMPLATE.replace("{format_instructions}", format_instruction)
 
-    prompt = PromptTemplate(
-        template=prompt_template,
+def _compile_prompt(answer_mode, length):
+    return PromptTemplate(
+        template=_render_template(answer_mode, length),
         input_variables=["context", "question"]
     )
-    
-    # Create retriever with similarity scores
-    retriever = vectorstore.as_retriever(
-        search_kwargs={"k": 3}
-    )
-    
-    # Create a simple chain class that mimics RetrievalQA
-    class QAClass:
-        def __init__(self, llm, retriever, prompt, vectorstore):
-            self.llm = llm
-            self.retriever = retriever
-            self.prompt = prompt
-            self.vectorstore = vectorstore
-            
-        def __call__(self, inputs):
-            query = inputs.get("query", "")
-            chat_history = inputs.get("chat_history", "")
-            
-            # Retrieve relevant documents
-            docs = self.retriever.invoke(query)
-            
-            # Get similarity scores using similarity_search_with_score
-            try:
-                # Use the vectorstore directly to get scores
-                docs_with_scores = self.vectorstore.similarity_search_with_score(
-                    query, k=len(docs)
+
+# Every mode x length prompt, compiled once at import
+PROMPTS = MappingProxyType({
+    (answer_mode, length): _compile_prompt(answer_mode, length)
+    for answer_mode in FORMAT_INSTRUCTIONS
+    for length in LENGTH_INSTRUCTIONS
+})
+
+def get_prompt(answer_mode="default", length="medium"):
+    """Get the compiled prompt for an answer mode and length"""
+    prompt = PROMPTS.get((answer_mode, length))
+    if prompt is None:
+        # Unknown modes fall back to the default instructions, unknown lengths to none
+        prompt = _compile_prompt(answer_mode, length)
+    return prompt
+
+def get_prompt_template(answer_mode="default", length="medium"):
+    """Get prompt template based on answer mode"""
+    return get_prompt(answer_mode, length).template
+
+def prompt_prefix(answer_mode="default", length="medium"):
+    """Static part of a prompt shared by every request with this mode and length"""
+    template = get_prompt_template(answer_mode, length)
+    return template[:template.index("{context}")]
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+def distances_to_similarities(distance_scores):
+    """Convert vector store distances to similarity scores for display"""
+    # ChromaDB returns distance scores (lower = more similar)
+    # For cosine similarity: distance ranges 0-2, similarity = 1 - (distance/2)
+    # Normalize scores to 0-1 range, then convert to percentage
+    if not distance_scores:
+        return []
+    max_dist = max(distance_scores)
+    scores = []
+    for dist in distance_scores:
+        # Handle different distance metrics
+        # For cosine distance (0-2 range): similarity = 1 - (dist/2)
+        # For L2 distance: normalize based on max distance
+        if dist <= 2:
+            # Likely cosine distance (0-2 range)
+            similarity = max(0, min(1, 1 - (dist / 2)))
+        elif max_dist > 0:
+            # Likely L2 distance, normalize relative to max
+            similarity = max(0, min(1, 1 - (dist / max_dist)))
+        else:
+            similarity = 0.85
+
+        # Ensure reasonable range (0.5 to 0.95) for display
+        similarity = max(0.5, min(0.95, similarity))
+        scores.append(similarity)
+    return scores
+
+class QAClass:
+    """Retrieval QA chain that mimics RetrievalQA"""
+
+    def __init__(self, llm, prompt, vectorstore, k=3, answer_mode="default",
+                 length="medium", cache=None, dense_weight=HYBRID_DENSE_WEIGHT,
+                 lexical_weight=HYBRID_LEXICAL_WEIGHT, context_budget=None):
+        self.llm = llm
+        self.prompt = prompt
+        self.vectorstore = vectorstore
+        self.k = k
+        self.answer_mode = answer_mode
+        self.length = length
+        self.cache = cache
+        self.dense_weight = dense_weight
+        self.lexical_weight = lexical_weight
+        self.context_budget = context_budget or CONTEXT_TOKEN_BUDGETS.get(length, CONTEXT_TOKEN_BUDGETS["medium"])
+        self.history_budget = HISTORY_TOKEN_BUDGETS.get(length, HISTORY_TOKEN_BUDGETS["medium"])
+        # Stores without a lexical index (e.g. Chroma) use dense retrieval only
+        self.hybrid = bool(lexical_weight) and hasattr(vectorstore, "lexical_search")
+
+    def retrieve(self, query, timings=None):
+        """Embed the query once and return documents, similarity scores and the query embedding"""
+        # Stage latencies (ms) are added to timings when given
+        timings = {} if timings is None else timings
+        query_embedding = None
+        # Hybrid mode fetches a wider candidate pool for fusion
+        fetch_k = max(self.k, HYBRID_FETCH_K) if self.hybrid else self.k
+        embeddings = getattr(self.vectorstore, "embeddings", None)
+        if embeddings is not None and hasattr(
+            self.vectorstore, "similarity_search_by_vector_with_relevance_scores"
+        ):
+            start = time.perf_counter()
+            with span("embed_query"):
+                query_embedding = embeddings.embed_query(query)
+            timings["embed_ms"] = _ms(start)
+            start = time.perf_counter()
+            with span("vector_search", k=fetch_k):
+                docs_with_scores = self.vectorstore.similarity_search_by_vector_with_relevance_scores(
+                    query_embedding, k=fetch_k
                 )
-                # Extract docs and distance scores
-                docs = [doc for doc, score in docs_with_scores]
-                distance_scores = [score for _, score in docs_with_scores]
-                
-                # Convert distance to similarity percentage
-                # ChromaDB returns distance scores (lower = more similar)
-                # For cosine similarity: distance ranges 0-2, similarity = 1 - (distance/2)
-                # Normalize scores to 0-1 range, then convert to percentage
-                if distance_scores:
-                    scores = []
-                    for dist in distance_scores:
-                        # Handle different distance metrics
-                        # For cosine distance (0-2 range): similarity = 1 - (dist/2)
-                        # For L2 distance: normalize based on max distance
-                        # Use a robust conversion that works for both
-                        if dist <= 2:
-                            # Likely cosine distance (0-2 range)
-                            similarity = max(0, min(1, 1 - (dist / 2)))
-                        else:
-                            # Likely L2 distance, normalize relative to max
-                            max_dist = max(distance_scores)
-                            if max_dist > 0:
-                                similarity = max(0, min(1, 1 - (dist / max_dist)))
-                            else:
-                                similarity = 0.85
-                        
-                        # Ensure reasonable range (0.5 to 0.95) for display
-                        similarity = max(0.5, min(0.95, similarity))
-                        scores.append(similarity)
-                else:
-                    scores = [0.85, 0.80, 0.75][:len(docs)]
-            except Exception as e:
-                # Fallback if scores not available
-                scores = [0.85, 0.80, 0.75][:len(docs)]  # Placeholder scores
-            
-            # Combine context from documents
-            context = "\n\n".join([doc.page_content for doc in docs])
-            
-            # Add chat history if provided
-            if chat_history:
-                full_query = f"Previous conversation:\n{chat_history}\n\nCurrent question: {query}"
-            else:
-                full_query = query
-            
-            # Format prompt
-            formatted_prompt = self.prompt.format(context=context, question=full_query)
-            
+        else:
+            start = time.perf_counter()
+            with span("vector_search", k=fetch_k):
+                docs_with_scores = self.vectorstore.similarity_search_with_score(query, k=fetch_k)
+
+        if self.hybrid:
+            with span("hybrid_fusion"):
+                docs_with_scores = self.fuse(query, query_embedding, docs_with_scores, fetch_k)
+        timings["search_ms"] = _ms(start)
+
+        docs = [doc for doc, _ in docs_with_scores]
+        try:
+            scores = distances_to_similarities([score for _, score in docs_with_scores])
+        except Exception:
+            # Fallback if scores not usable
+            scores = [0.85, 0.80, 0.75][:len(docs)]  # Placeholder scores
+        return docs, scores, query_embedding
+
+    def fuse(self, query, query_embedding, dense, fetch_k):
+        """Fuse dense and BM25 rankings; returns the top k as (document, cosine distance)"""
+        lexical = self.vectorstore.lexical_search(query, k=fetch_k)
+        if not lexical:
+            return dense[:self.k]
+
+        docs = {}
+        distances = {}
+        for doc, distance in dense:
+            key = doc.id or doc.page_content
+            docs[key] = doc
+            distances[key] = distance
+        for doc, _ in lexical:
+            docs.setdefault(doc.id or doc.page_content, doc)
+        fused = reciprocal_rank_fusion(
+            [[doc.id or doc.page_content for doc, _ in dense],
+             [doc.id or doc.page_content for doc, _ in lexical]],
+            [self.dense_weight, self.lexical_weight],
+            RRF_K,
+        )[:self.k]
+
+        # Keyword-only hits have no dense score yet: score their stored vectors,
+        # or embed them again for stores that can't look vectors up by ID
+        missing = [key for key, _ in fused if key not in distances]
+        if missing and query_embedding is not None and hasattr(self.vectorstore, "distances_by_id"):
+            distances.update(self.vectorstore.distances_by_id(missing, query_embedding))
+            missing = [key for key in missing if key not in distances]
+        if missing and query_embedding is not None:
+            vectors = np.asarray(self.vectorstore.embeddings.embed_documents(
+                [docs[key].page_content for key in missing]
+            ), dtype=np.float32)
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vector)
+            norms[norms == 0] = 1.0
+            for key, similarity in zip(missing, vectors @ query_vector / norms):
+                distances[key] = float(1.0 - similarity)
+        return [(docs[key], distances.get(key, 2.0)) for key, _ in fused]
+
+    @traced("qa.prepare")
+    def prepare(self, inputs):
+        """Retrieve context and build the prompt for a question"""
+        query = inputs.get("query", "")
+        timings = {}
+        # chat_history: (question, answer) turns or preformatted text
+        chat_history = format_history(inputs.get("chat_history") or "", self.history_budget)
+
+        # Retrieve relevant documents and their scores in a single search
+        docs, scores, query_embedding = self.retrieve(query, timings)
+
+        start = time.perf_counter()
+        # Pack the most relevant chunks into the token budget, merging overlaps
+        context, used_docs, context_tokens = build_context(docs, self.context_budget)
+        used = {id(doc) for doc in used_docs}
+        scores = [score for doc, score in zip(docs, scores) if id(doc) in used]
+        docs = used_docs
+
+        # Add chat history if provided
+        if chat_history:
+            full_query = f"Previous conversation:\n{chat_history}\n\nCurrent question: {query}"
+        else:
+            full_query = query
+
+        # Format prompt
+        formatted_prompt = self.prompt.format(context=context, question=full_query)
+        timings["prompt_ms"] = _ms(start)
+        current_span().set(docs=len(docs), context_tokens=context_tokens)
+        return {
+            "query": query,
+            "docs": docs,
+            "scores": scores,
+            "query_embedding": query_embedding,
+            "fingerprint": context_fingerprint(docs, chat_history),
+            "prompt": formatted_prompt,
+            "context_tokens": context_tokens,
+            "timings": timings,
+        }
+
+    def metrics(self, prepared, cached, usage):
+        """Per-query metrics for the query log (timings/usage fill in as a stream completes)"""
+        return {
+            "answer_mode": self.answer_mode,
+            "length": self.length,
+            "k": self.k,
+            "hybrid": self.hybrid,
+            "context_tokens": prepared["context_tokens"],
+            "similarity_scores": [round(score, 4) for score in prepared["scores"]],
+            "answer_cached": cached,
+            "timings": prepared["timings"],
+            "usage": usage,
+        }
+
+    def cached_answer(self, prepared):
+        """Look up a cached answer for a prepared question"""
+        if self.cache is None:
+            return None
+        return self.cache.get(
+            prepared["query"], self.answer_mode, self.length,
+            prepared["fingerprint"], prepared["query_embedding"]
+        )
+
+    def cache_answer(self, prepared, answer):
+        """Store a generated answer (errors and empty answers are never cached)"""
+        if self.cache is None or not answer.strip() or answer.startswith("Error generating answer"):
+            return
+        self.cache.put(
+            prepared["query"], self.answer_mode, self.length,
+            prepared["fingerprint"], answer, prepared["query_embedding"]
+        )
+
+    def finish(self, prepared, answer, usage):
+        """Bookkeeping once an answer has been generated: token totals and the answer cache"""
+        record_usage(usage)
+        self.cache_answer(prepared, answer)
+
+    def response(self, prepared, cached, usage, **answer):
+        """Response shared by all entry points; answer is result= (text) or stream= (tokens)"""
+        return {
+            **answer,
+            "source_documents": prepared["docs"],
+            "similarity_scores": prepared["scores"],
+            "cached": cached,
+            "usage": usage,
+            "timings": prepared["timings"],
+            "metrics": self.metrics(prepared, cached, usage),
+        }
+
+    @traced("qa.call")
+    def __call__(self, inputs):
+        started = time.perf_counter()
+        prepared = self.prepare(inputs)
+        timings = prepared["timings"]
+        answer = self.cached_answer(prepared)
+        cached = answer is not None
+        current_span().set(answer_mode=self.answer_mode, length=self.length, cached=cached)
+        usage = {}
+
+        if not cached:
             # Generate answer (handle ChatGroq and ChatOpenAI message format)
+            start = time.perf_counter()
             try:
-                if hasattr(self.llm, 'invoke'):
-                    # For ChatGroq/ChatOpenAI, use HumanMessage format
-                    from langchain_core.messages import HumanMessage
-                    messages = [HumanMessage(content=formatted_prompt)]
-                    answer = self.llm.invoke(messages)
-                    # Extract content if it's a message object
-                    if hasattr(answer, 'content'):
-                        answer = answer.content
-                    else:
-                        answer = str(answer)
-                else:
-                    # Fallback for string-based LLMs
-                    answer = str(self.llm(formatted_prompt))
+                answer = invoke_llm(self.llm, prepared["prompt"], usage)
             except Exception as e:
                 # Fallback: try direct invoke with string
                 try:
-                    answer = str(self.llm.invoke(formatted_prompt))
+                    answer = str(self.llm.invoke(prepared["prompt"]))
                 except:
                     answer = f"Error generating answer: {str(e)}"
-            
-            return {
-                "result": str(answer),
-                "source_documents": docs,
-                "similarity_scores": scores
-            }
-    
-    return QAClass(llm, retriever, prompt, vectorstore)
+            timings["llm_ms"] = _ms(start)
+            self.finish(prepared, str(answer), usage)
+        timings["total_ms"] = _ms(started)
+        return self.response(prepared, cached, usage, result=str(answer))
+
+    def stream(self, inputs):
+        """Retrieve eagerly and return a generator of answer tokens"""
+        started = time.perf_counter()
+        # The request span stays open until the token generator finishes, so slow
+        # generation is timed (and profiled) as part of it
+        root = span("qa.stream", answer_mode=self.answer_mode, length=self.length).open()
+        try:
+            with use_span(root):
+                prepared = self.prepare(inputs)
+                cached_answer = self.cached_answer(prepared)
+        except BaseException as e:
+            root.close(e)
+            raise
+        root.set(cached=cached_answer is not None)
+        timings = prepared["timings"]
+        # Filled in once the stream finishes
+        usage = {}
+
+        def tokens():
+            try:
+                if cached_answer is not None:
+                    yield cached_answer
+                    return
+                parts = []
+                start = time.perf_counter()
+                # Not made current: the consumer runs its own code between tokens
+                llm_span = span("llm.stream", parent=root).open()
+                try:
+                    for token in stream_llm(self.llm, prepared["prompt"], usage):
+                        if not parts:
+                            timings["llm_ttft_ms"] = _ms(start)
+                        parts.append(token)
+                        yield token
+                except Exception as e:
+                    llm_span.close(e)
+                    yield f"Error generating answer: {str(e)}"
+                    return
+                finally:
+                    timings["llm_ms"] = _ms(start)
+                    llm_span.close()
+                self.finish(prepared, "".join(parts), usage)
+            finally:
+                timings["total_ms"] = _ms(started)
+                root.close()
+
+        return self.response(prepared, cached_answer is not None, usage, stream=tokens())
+
+    @traced("qa.acall")
+    async def acall(self, inputs):
+        """Async __call__: embedding and search run in a worker thread, generation on the event loop"""
+        started = time.perf_counter()
+        prepared = await asyncio.to_thread(self.prepare, inputs)
+        timings = prepared["timings"]
+        answer = self.cached_answer(prepared)
+        cached = answer is not None
+        current_span().set(answer_mode=self.answer_mode, length=self.length, cached=cached)
+        usage = {}
+
+        if not cached:
+            start = time.perf_counter()
+            try:
+                answer = await ainvoke_llm(self.llm, prepared["prompt"], usage)
+            except Exception as e:
+                answer = f"Error generating answer: {str(e)}"
+            # Includes any wait for a provider concurrency slot
+            timings["llm_ms"] = _ms(start)
+            self.finish(prepared, str(answer), usage)
+        timings["total_ms"] = _ms(started)
+        return self.response(prepared, cached, usage, result=str(answer))
+
+    async def astream(self, inputs):
+        """Async stream: retrieve in a worker thread and return an async generator of answer tokens"""
+        started = time.perf_counter()
+        root = span("qa.astream", answer_mode=self.answer_mode, length=self.length).open()
+        try:
+            with use_span(root):
+                prepared = await asyncio.to_thread(self.prepare, inputs)
+                cached_answer = self.cached_answer(prepared)
+        except BaseException as e:
+            root.close(e)
+            raise
+        root.set(cached=cached_answer is not None)
+        timings = prepared["timings"]
+        usage = {}
+
+        async def tokens():
+            try:
+                if cached_answer is not None:
+                    yield cached_answer
+                    return
+                parts = []
+                start = time.perf_counter()
+                # Not made current: the consumer runs its own code between tokens
+                llm_span = span("llm.stream", parent=root).open()
+                try:
+                    async for token in astream_llm(self.llm, prepared["prompt"], usage):
+                        if not parts:
+                            timings["llm_ttft_ms"] = _ms(start)
+                        parts.append(token)
+                        yield token
+                except Exception as e:
+                    llm_span.close(e)
+                    yield f"Error generating answer: {str(e)}"
+                    return
+                finally:
+                    timings["llm_ms"] = _ms(start)
+                    llm_span.close()
+                self.finish(prepared, "".join(parts), usage)
+            finally:
+                timings["total_ms"] = _ms(started)
+                root.close()
+
+        return self.response(prepared, cached_answer is not None, usage, stream=tokens())
+
+def create_qa_chain(llm, vectorstore, answer_mode="default", length="medium", k=3, cache=None,
+                    dense_weight=None, lexical_weight=None, context_budget=None):
+    """Create RAG QA chain with custom prompt (cache=False disables the answer cache)"""
+    prompt = get_prompt(answer_mode, length)
+
+    if cache is None:
+        cache = get_answer_cache()
+    elif cache is False:
+        cache = None
+    return QAClass(llm, prompt, vectorstore, k=k, answer_mode=answer_mode,
+                   length=length, cache=cache,
+                   dense_weight=HYBRID_DENSE_WEIGHT if dense_weight is None else dense_weight,
+                   lexical_weight=HYBRID_LEXICAL_WEIGHT if lexical_weight is None else lexical_weight,
+                   context_budget=context_budget)
@@ -0,0 +1,107 @@
+from rag.embeddings import get_embeddings
+from rag.qa_chain import create_qa_chain, get_llm
+from rag.storage import get_storage_manager
+from rag.vector_store import create_session_store
+import os
+import threading
+import time
+import uuid
+
+class KnowledgeBase:
+    """One client's vector store plus the QA chains built on it"""
+
+    def __init__(self, kb_id, vectorstore, storage_session):
+        self.kb_id = kb_id
+        self.vectorstore = vectorstore
+        # Keeps the store's db_* directory alive until the knowledge base is dropped
+        self.storage_session = storage_session
+        self.created = time.time()
+        self.last_used = time.monotonic()
+        # Serializes ingests; queries run concurrently against the store
+        self.write_lock = threading.Lock()
+        self._chains = {}
+        self._chains_lock = threading.Lock()
+
+    def chain(self, provider="groq", api_key=None, answer_mode="default", length="medium", k=3):
+        """Get (or build) the QA chain for these settings"""
+        llm = get_llm(provider=provider, api_key=api_key)
+        key = (id(llm), answer_mode, length, k)
+        with self._chains_lock:
+            chain = self._chains.get(key)
+            if chain is None:
+                chain = create_qa_chain(llm, self.vectorstore, answer_mode=answer_mode, length=length, k=k)
+                self._chains[key] = chain
+            return chain
+
+    def info(self):
+        """Summary of the knowledge base for API responses"""
+        sources = sorted({
+            metadata.get("source", "unknown")
+            for metadata in self.vectorstore.get(include=["metadatas"])["metadatas"]
+        })
+        return {
+            "kb_id": self.kb_id,
+            "chunks": len(self.vectorstore.get(include=[])["ids"]),
+            "sources": sources,
+            "created": self.created,
+        }
+
+class KnowledgeBaseRegistry:
+    """Knowledge bases keyed by ID, dropped after a period without use"""
+
+    def __init__(self, idle_seconds=3600):
+        self.idle_seconds = idle_seconds
+        self._bases = {}
+        self._lock = threading.Lock()
+
+    def create(self, kb_id=None):
+        """Create an empty knowledge base"""
+        kb_id = kb_id or uuid.uuid4().hex
+        if self.get(kb_id) is not None:
+            raise ValueError(f"Knowledge base already exists: {kb_id}")
+        storage = get_storage_manager()
+        storage_session = storage.open_session()
+        vector_backend = os.getenv("VECTOR_BACKEND", "numpy")
+        db_dir = storage.new_db_dir(storage_session.session_id) if vector_backend == "chroma" else None
+        vectorstore = create_session_store(get_embeddings(), db_dir, vector_backend)
+        kb = KnowledgeBase(kb_id, vectorstore, storage_session)
+        with self._lock:
+            self._evict_idle()
+            if kb_id in self._bases:
+                raise ValueError(f"Knowledge base already exists: {kb_id}")
+            self._bases[kb_id] = kb
+        return kb
+
+    def get(self, kb_id):
+        """Get a knowledge base, or None if unknown or expired"""
+        with self._lock:
+            self._evict_idle()
+            kb = self._bases.get(kb_id)
+            if kb is not None:
+                kb.last_used = time.monotonic()
+            return kb
+
+    def drop(self, kb_id):
+        """Forget a knowledge base; its storage is released once it is garbage collected"""
+        with self._lock:
+            return self._bases.pop(kb_id, None) is not None
+
+    def __len__(self):
+        return len(self._bases)
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        for kb_id, kb in list(self._bases.items()):
+            if now - kb.last_used > self.idle_seconds:
+                del self._bases[kb_id]
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    """Get the process-wide knowledge base registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = KnowledgeBaseRegistry(idle_seconds=float(os.getenv("KB_IDLE_SECONDS", "3600")))
+        return _registry
@@ -1,10 +1,26 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from rag.tracing import current_span, traced
 
-def split_docs(docs, chunk_size=500, chunk_overlap=100):
-    """Split documents into chunks"""
-    splitter = RecursiveCharacterTextSplitter(
+def get_splitter(chunk_size=500, chunk_overlap=100):
+    """Get the text splitter used for all documents"""
+    # Imported on first use to keep app startup fast
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len,
+        # Chunk offsets let the context builder merge overlapping neighbours exactly
+        add_start_index=True,
     )
-    return splitter.split_documents(docs)
+
+@traced("split_docs")
+def split_docs(docs, chunk_size=500, chunk_overlap=100):
+    """Split documents into chunks"""
+    chunks = get_splitter(chunk_size, chunk_overlap).split_documents(docs)
+    current_span().set(documents=len(docs), chunks=len(chunks))
+    return chunks
+
+def iter_split_docs(docs, chunk_size=500, chunk_overlap=100):
+    """Lazily split an iterable of documents, yielding chunks one document at a time"""
+    splitter = get_splitter(chunk_size, chunk_overlap)
+    for doc in docs:
+        yield from splitter.split_documents([doc])
@@ -0,0 +1,276 @@
+from pathlib import Path
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+
+DB_PREFIX = "db_"
+UPLOAD_PREFIX = "interview-prep-upload-"
+# "<hostname> <pid>" of the process using a directory, touched on every sweep as a heartbeat
+OWNER_FILE = ".owner"
+
+def _remove_readonly(func, path, exc):
+    # Chroma/SQLite files can be read-only on Windows
+    os.chmod(path, stat.S_IWRITE)
+    func(path)
+
+def _pid_alive(pid):
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows; rely on the heartbeat there
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists but belongs to another user
+        return True
+    return True
+
+def dir_size(path):
+    """Total size in bytes of the files under a directory"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+class SessionHandle:
+    """Ties storage to a UI session; its paths are released when it is garbage collected"""
+
+    def __init__(self, manager):
+        self.session_id = uuid.uuid4().hex
+        weakref.finalize(self, manager.release_session, self.session_id)
+
+class StorageManager:
+    """Reference-counted lifecycle for session vector stores and upload temp dirs"""
+
+    def __init__(self, db_root=".", temp_root=None, max_age_seconds=24 * 3600,
+                 max_total_bytes=2 * 1024 ** 3, sweep_interval=600):
+        self.db_root = Path(db_root)
+        self.temp_root = Path(temp_root or tempfile.gettempdir())
+        self.max_age_seconds = max_age_seconds
+        self.max_total_bytes = max_total_bytes
+        self.sweep_interval = sweep_interval
+        # Another process's directory is left alone while its owner file is fresher than this
+        self.owner_timeout = max(3 * sweep_interval, 300)
+        self._owner = f"{socket.gethostname()} {os.getpid()}"
+        self.reclaimed_bytes = 0
+        self.reclaimed_dirs = 0
+        self._refs = {}
+        self._session_paths = {}
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stop = threading.Event()
+
+    def open_session(self):
+        """Start tracking a new session"""
+        return SessionHandle(self)
+
+    def new_db_dir(self, session_id):
+        """Reserve a vector store directory owned by a session"""
+        path = self.db_root / f"{DB_PREFIX}{uuid.uuid4().hex[:8]}"
+        path.mkdir(parents=True, exist_ok=True)
+        self._claim(path)
+        self.acquire(path, session_id)
+        return str(path)
+
+    def new_temp_dir(self, session_id):
+        """Create an upload temp directory owned by a session"""
+        path = Path(tempfile.mkdtemp(prefix=UPLOAD_PREFIX, dir=self.temp_root))
+        self._claim(path)
+        self.acquire(path, session_id)
+        return str(path)
+
+    def acquire(self, path, session_id):
+        """Add a session reference to a path"""
+        path = Path(path).resolve()
+        with self._lock:
+            self._refs[path] = self._refs.get(path, 0) + 1
+            self._session_paths.setdefault(session_id, []).append(path)
+
+    def release_path(self, path, session_id=None):
+        """Drop references to a path and delete it once unreferenced"""
+        path = Path(path).resolve()
+        with self._lock:
+            if session_id is not None:
+                paths = self._session_paths.get(session_id, [])
+                count = paths.count(path)
+                self._session_paths[session_id] = [p for p in paths if p != path]
+                self._refs[path] = self._refs.get(path, 0) - count
+            else:
+                for paths in self._session_paths.values():
+                    paths[:] = [p for p in paths if p != path]
+                self._refs[path] = 0
+            if self._refs[path] > 0:
+                return 0
+            del self._refs[path]
+        return self._remove(path)
+
+    def release_session(self, session_id):
+        """Release every path owned by a session"""
+        with self._lock:
+            paths = self._session_paths.pop(session_id, [])
+            orphaned = []
+            for path in paths:
+                self._refs[path] = self._refs.get(path, 0) - 1
+                if self._refs[path] <= 0:
+                    del self._refs[path]
+                    orphaned.append(path)
+        return sum(self._remove(path) for path in orphaned)
+
+    def sweep(self, min_age_seconds=None):
+        """Delete unreferenced stores/temp dirs that are too old or over the size budget"""
+        if min_age_seconds is None:
+            min_age_seconds = self.max_age_seconds
+        self._heartbeat()
+        now = time.time()
+        candidates = []
+        total = 0
+        for path in self._managed_dirs():
+            size = dir_size(path)
+            total += size
+            with self._lock:
+                referenced = path in self._refs
+            # Directories of other live processes sharing DB_ROOT count towards the
+            # budget but are never deleted from here
+            if not referenced and not self._owned_elsewhere(path, now):
+                try:
+                    mtime = path.stat().st_mtime
+                except OSError:
+                    continue
+                candidates.append((mtime, path, size))
+
+        reclaimed = 0
+        # Oldest first, so the size budget is enforced by removing stale data
+        for mtime, path, size in sorted(candidates):
+            too_old = now - mtime > min_age_seconds
+            over_budget = total > self.max_total_bytes
+            if not (too_old or over_budget):
+                continue
+            freed = self._remove(path)
+            reclaimed += freed
+            total -= freed
+        return reclaimed
+
+    def reclaim_on_startup(self):
+        """Remove stores and temp dirs left behind by previous processes"""
+        # Nothing is referenced yet; directories of other running processes are skipped
+        # by their owner files, and very recent ones in case an owner is still being written
+        return self.sweep(min_age_seconds=60)
+
+    def start_sweeper(self):
+        """Run sweep() periodically in a background thread"""
+        with self._lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return self._sweeper
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="storage-sweeper", daemon=True)
+            self._sweeper.start()
+            return self._sweeper
+
+    def stop_sweeper(self):
+        """Stop the background sweeper"""
+        self._stop.set()
+
+    def stats(self):
+        """Get tracked paths and reclaimed totals"""
+        with self._lock:
+            return {
+                "tracked_paths": len(self._refs),
+                "sessions": len(self._session_paths),
+                "reclaimed_bytes": self.reclaimed_bytes,
+                "reclaimed_dirs": self.reclaimed_dirs,
+            }
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception:
+                pass
+
+    def _claim(self, path):
+        try:
+            (Path(path) / OWNER_FILE).write_text(self._owner, encoding="utf-8")
+        except OSError:
+            pass
+
+    def _heartbeat(self):
+        """Refresh the owner files of every directory this process still references"""
+        with self._lock:
+            paths = list(self._refs)
+        for path in paths:
+            owner_file = path / OWNER_FILE
+            try:
+                os.utime(owner_file)
+            except FileNotFoundError:
+                # Recreated by a backend (e.g. Chroma resetting its directory)
+                if path.is_dir():
+                    self._claim(path)
+            except OSError:
+                pass
+
+    def _owned_elsewhere(self, path, now):
+        """Whether another process that still appears to be running owns a directory"""
+        owner_file = path / OWNER_FILE
+        try:
+            host, pid = owner_file.read_text(encoding="utf-8").split()
+            heartbeat = owner_file.stat().st_mtime
+            pid = int(pid)
+        except (OSError, ValueError):
+            # No (readable) owner: left behind by a crashed or older process
+            return False
+        if f"{host} {pid}" == self._owner:
+            return False
+        if host == socket.gethostname() and not _pid_alive(pid):
+            return False
+        return now - heartbeat < self.owner_timeout
+
+    def _managed_dirs(self):
+        dirs = []
+        for root, prefix in ((self.db_root, DB_PREFIX), (self.temp_root, UPLOAD_PREFIX)):
+            try:
+                dirs.extend(p.resolve() for p in root.glob(f"{prefix}*") if p.is_dir())
+            except OSError:
+                pass
+        return dirs
+
+    def _remove(self, path):
+        if not path.exists():
+            return 0
+        size = dir_size(path)
+        try:
+            shutil.rmtree(path, onerror=_remove_readonly)
+        except Exception:
+            # Still in use (e.g. open SQLite handles); the sweeper retries later
+            return 0
+        with self._lock:
+            self.reclaimed_bytes += size
+            self.reclaimed_dirs += 1
+        return size
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_storage_manager():
+    """Get the process-wide storage manager (runs a startup reclaim pass once)"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = StorageManager(
+                db_root=os.getenv("DB_ROOT", "."),
+                max_age_seconds=float(os.getenv("STORAGE_MAX_AGE_HOURS", "24")) * 3600,
+                max_total_bytes=int(float(os.getenv("STORAGE_MAX_MB", "2048")) * 1024 ** 2),
+                sweep_interval=float(os.getenv("STORAGE_SWEEP_SECONDS", "600")),
+            )
+            _manager.reclaim_on_startup()
+            _manager.start_sweeper()
+        return _manager
@@ -0,0 +1,305 @@
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+import atexit
+import contextlib
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+
+TRACE_DIR = Path("logs") / "traces"
+PROFILE_DIR = Path("logs") / "profiles"
+
+# Innermost open span in this thread / async task; new spans become its children
+_current = contextvars.ContextVar("rag_tracing_span", default=None)
+
+_enabled = False
+_exporters = ()
+_profile_ms = None
+_profiler = "cprofile"
+_ring = None
+_jsonl = None
+_lock = threading.Lock()
+
+class Span:
+    """One timed operation; spans opened while it is active become its children"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "start", "duration_ms",
+                 "error", "_started", "_token", "_profiler")
+
+    def __init__(self, name, parent=None, attrs=None):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self.attrs = attrs or {}
+        self.start = None
+        self.duration_ms = None
+        self.error = None
+        self._started = None
+        self._token = None
+        self._profiler = None
+
+    def set(self, **attrs):
+        """Attach attributes (sizes, counts, cache hits) to the span"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Closed from another context (e.g. a generator finished by another task)
+            pass
+        self.close(exc)
+        return False
+
+    def open(self):
+        """Start timing without making the span current (see use_span); end it with close()"""
+        if self.parent_id is None and _profile_ms is not None:
+            # Only whole requests are profiled; the profile is kept if they turn out slow
+            self._profiler = _start_profiler()
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def close(self, exc=None):
+        """Stop timing and export the span (once)"""
+        if self._started is None or self.duration_ms is not None:
+            return
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 3)
+        if exc is not None:
+            self.error = f"{type(exc).__name__}: {exc}"
+        if self._profiler is not None:
+            path = _stop_profiler(self._profiler, self)
+            self._profiler = None
+            if path:
+                self.attrs["profile"] = path
+        _export(self)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": datetime.fromtimestamp(self.start).isoformat(),
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            "attrs": self.attrs,
+        }
+
+class _NoopSpan:
+    """Returned while tracing is disabled, so instrumented code pays almost nothing"""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def open(self):
+        return self
+
+    def close(self, exc=None):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+def span(name, parent=None, **attrs):
+    """Time a block: `with span("vector_search", k=3) as s: ...; s.set(hits=len(docs))`"""
+    # parent: attach to a span that is no longer active (e.g. from a streaming generator)
+    if not _enabled:
+        return _NOOP_SPAN
+    if not isinstance(parent, Span):
+        parent = _current.get()
+    return Span(name, parent, attrs)
+
+@contextlib.contextmanager
+def use_span(span):
+    """Make an open span current for a block without closing it at the end"""
+    # For spans that outlive one call, e.g. a request whose answer is streamed later
+    if not isinstance(span, Span):
+        yield span
+        return
+    token = _current.set(span)
+    try:
+        yield span
+    finally:
+        _current.reset(token)
+
+def current_span():
+    """The innermost active span (a no-op span when there is none or tracing is disabled)"""
+    return (_current.get() if _enabled else None) or _NOOP_SPAN
+
+def traced(name=None):
+    """Decorator wrapping every call of a function (sync or async) in a span"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                with Span(span_name, _current.get()):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(span_name, _current.get()):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class RingBufferExporter:
+    """Keeps the most recent spans in memory (shown in the app's debug panel)"""
+
+    def __init__(self, size=1000):
+        self._spans = deque(maxlen=size)
+
+    def export(self, span):
+        self._spans.append(span)
+
+    def spans(self, limit=None):
+        spans = list(self._spans)
+        return spans[-limit:] if limit else spans
+
+    def clear(self):
+        self._spans.clear()
+
+class JsonlExporter:
+    """Writes spans to logs/traces/traces_<date>.jsonl through a buffered background logger"""
+
+    def __init__(self, log_dir=TRACE_DIR):
+        self.log_dir = log_dir
+        self.logger = None
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        if self.logger is None:
+            # Started on the first span, so processes that never trace get no writer thread.
+            # Same writer as the query log: batched, rotated and never blocking the caller
+            from rag.logger import QueryLogger
+            with self._lock:
+                if self.logger is None:
+                    self.logger = QueryLogger(self.log_dir, prefix="traces")
+                    atexit.register(self.logger.close)
+        self.logger.log(span)
+
+    def stats(self):
+        return self.logger.stats() if self.logger is not None else None
+
+def _export(span):
+    if not _exporters:
+        return
+    data = span.to_dict()
+    for exporter in _exporters:
+        try:
+            exporter.export(data)
+        except Exception:
+            # Tracing must never break the traced code
+            pass
+
+def _start_profiler():
+    if _profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        except Exception:
+            # Not installed, or another profiler is running in this thread
+            return None
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another request is already being profiled
+        return None
+    return profiler
+
+def _stop_profiler(profiler, span):
+    """Stop profiling a root span and save the profile if it was slow; returns the file path"""
+    try:
+        if _profiler == "pyinstrument":
+            profiler.stop()
+        else:
+            profiler.disable()
+        if span.duration_ms < _profile_ms:
+            return None
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        stem = f"{datetime.now():%Y%m%d-%H%M%S}_{span.name}_{span.duration_ms:.0f}ms_{span.span_id}"
+        if _profiler == "pyinstrument":
+            path = PROFILE_DIR / f"{stem}.html"
+            path.write_text(profiler.output_html(), encoding="utf-8")
+        else:
+            path = PROFILE_DIR / f"{stem}.prof"
+            profiler.dump_stats(path)
+        return str(path)
+    except Exception:
+        return None
+
+def configure(enabled=None, exporters=None, profile_ms=None, profiler=None):
+    """Turn tracing on or off and choose exporters; unset arguments come from the environment"""
+    # Env: TRACING (true/false), TRACE_EXPORTERS ("ring,jsonl"), TRACE_RING_SIZE,
+    # TRACE_PROFILE_MS (profile requests slower than this), TRACE_PROFILER (cprofile/pyinstrument).
+    # exporters may also hold any objects with an export(span_dict) method.
+    global _enabled, _exporters, _profile_ms, _profiler, _ring, _jsonl
+    if enabled is None:
+        enabled = os.getenv("TRACING", "false").lower() == "true"
+    if exporters is None:
+        exporters = os.getenv("TRACE_EXPORTERS", "ring,jsonl").split(",")
+    if profile_ms is None and os.getenv("TRACE_PROFILE_MS"):
+        profile_ms = float(os.getenv("TRACE_PROFILE_MS"))
+    profiler = profiler or os.getenv("TRACE_PROFILER", "cprofile")
+    if profiler not in ("cprofile", "pyinstrument"):
+        raise ValueError(f"Unsupported profiler: {profiler}")
+
+    resolved = []
+    with _lock:
+        for exporter in exporters if enabled else ():
+            if exporter == "ring":
+                if _ring is None:
+                    _ring = RingBufferExporter(int(os.getenv("TRACE_RING_SIZE", "1000")))
+                exporter = _ring
+            elif exporter == "jsonl":
+                if _jsonl is None:
+                    _jsonl = JsonlExporter()
+                exporter = _jsonl
+            elif isinstance(exporter, str):
+                if not exporter.strip():
+                    continue
+                raise ValueError(f"Unsupported trace exporter: {exporter}")
+            resolved.append(exporter)
+        _exporters = tuple(resolved)
+        _profile_ms = profile_ms if enabled else None
+        _profiler = profiler
+        _enabled = bool(enabled)
+
+def disable():
+    """Turn tracing off (e.g. in worker processes whose spans nobody collects)"""
+    configure(enabled=False)
+
+def is_enabled():
+    return _enabled
+
+def get_recent_spans(limit=None):
+    """Most recent spans from the in-memory ring buffer, oldest first"""
+    return _ring.spans(limit) if _ring is not None else []
+
+configure()
@@ -1,18 +1,287 @@
-from langchain_community.vectorstores import Chroma
+from langchain_core.vectorstores import VectorStore
+from rag.bm25 import reciprocal_rank_fusion
+from rag.embeddings import DEFAULT_MODEL_NAME
+from rag.numpy_store import NumpyVectorStore, VECTORS_FILE
+from rag.tracing import current_span, traced
+import hashlib
+import json
 import os
+import queue
+import threading
 
-def create_vector_store(chunks, embeddings, persist_directory="db"):
-    """Create or load vector store"""
-    if os.path.exists(persist_directory):
-        # Load existing vector store
-        return Chroma(
+# Stay below Chroma's maximum batch size when writing
+ADD_BATCH_SIZE = 1000
+# Streaming ingest: chunks per embedding batch and batches buffered ahead of the writer
+STREAM_BATCH_SIZE = 64
+STREAM_PREFETCH = 4
+BASE_META_FILE = "base_index.json"
+
+def _hash(text, length=16):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:length]
+
+def document_id(source):
+    """Stable identity for a source document"""
+    return _hash(str(source), 12)
+
+def assign_chunk_ids(chunks, seen=None):
+    """Give each chunk a stable ID derived from its source and content"""
+    ids = []
+    # Occurrence counts; pass the same dict when assigning IDs batch by batch
+    seen = {} if seen is None else seen
+    for chunk in chunks:
+        doc_id = document_id(chunk.metadata.get("source", "unknown"))
+        content_hash = _hash(chunk.page_content)
+        # Identical text can appear more than once in the same document
+        occurrence = seen.get((doc_id, content_hash), 0)
+        seen[(doc_id, content_hash)] = occurrence + 1
+        chunk.metadata["doc_id"] = doc_id
+        chunk.metadata["content_hash"] = content_hash
+        ids.append(f"{doc_id}-{content_hash}-{occurrence}")
+    return ids
+
+def _existing_ids(vectorstore, ids=None, where=None):
+    if ids is not None and not ids:
+        return set()
+    result = vectorstore.get(ids=ids, where=where, include=[])
+    return set(result["ids"])
+
+def _add_missing(vectorstore, chunks, ids, existing):
+    new = [(chunk, chunk_id) for chunk, chunk_id in zip(chunks, ids) if chunk_id not in existing]
+    for start in range(0, len(new), ADD_BATCH_SIZE):
+        batch = new[start:start + ADD_BATCH_SIZE]
+        vectorstore.add_documents(
+            [chunk for chunk, _ in batch],
+            ids=[chunk_id for _, chunk_id in batch]
+        )
+    return len(new)
+
+def _delete(vectorstore, ids):
+    ids = list(ids)
+    if ids:
+        vectorstore.delete(ids=ids)
+    return len(ids)
+
+def add_documents(vectorstore, chunks):
+    """Add chunks, skipping ones already stored"""
+    ids = assign_chunk_ids(chunks)
+    existing = _existing_ids(vectorstore, ids=ids)
+    added = _add_missing(vectorstore, chunks, ids, existing)
+    return {"added": added, "removed": 0, "unchanged": len(ids) - added}
+
+def remove_documents(vectorstore, source):
+    """Remove every chunk of a source document"""
+    ids = _existing_ids(vectorstore, where={"doc_id": document_id(source)})
+    return {"added": 0, "removed": _delete(vectorstore, ids), "unchanged": 0}
+
+def update_documents(vectorstore, chunks):
+    """Replace the stored chunks of each source present in chunks"""
+    ids = assign_chunk_ids(chunks)
+    new_ids = set(ids)
+    stale = set()
+    for doc_id in {chunk.metadata["doc_id"] for chunk in chunks}:
+        stale |= _existing_ids(vectorstore, where={"doc_id": doc_id}) - new_ids
+    removed = _delete(vectorstore, stale)
+    existing = _existing_ids(vectorstore, ids=ids)
+    added = _add_missing(vectorstore, chunks, ids, existing)
+    return {"added": added, "removed": removed, "unchanged": len(ids) - added}
+
+def sync_vector_store(vectorstore, chunks):
+    """Make the store hold exactly these chunks, embedding only what changed"""
+    ids = assign_chunk_ids(chunks)
+    existing = _existing_ids(vectorstore)
+    removed = _delete(vectorstore, existing - set(ids))
+    added = _add_missing(vectorstore, chunks, ids, existing)
+    return {"added": added, "removed": removed, "unchanged": len(ids) - added}
+
+def _batches(chunks, batch_size):
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def sync_vector_store_streaming(vectorstore, chunks, batch_size=STREAM_BATCH_SIZE,
+                                prefetch=STREAM_PREFETCH):
+    """Like sync_vector_store, but consumes a chunk iterator in bounded batches"""
+    # The caller's thread keeps pulling chunks (parsing/splitting) while a
+    # writer thread embeds and stores earlier batches, so the stages overlap
+    # and at most `prefetch` batches are held in memory
+    existing = _existing_ids(vectorstore)
+    seen_ids = set()
+    counts = {"added": 0, "removed": 0, "unchanged": 0}
+    total = 0
+    batches = queue.Queue(maxsize=prefetch)
+    errors = []
+
+    def writer():
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            if errors:
+                continue
+            try:
+                batch_chunks, batch_ids = batch
+                counts["added"] += _add_missing(vectorstore, batch_chunks, batch_ids, existing)
+            except Exception as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=writer, name="vector-store-writer", daemon=True)
+    thread.start()
+    occurrences = {}
+    try:
+        for batch in _batches(chunks, batch_size):
+            ids = assign_chunk_ids(batch, occurrences)
+            seen_ids.update(ids)
+            total += len(ids)
+            batches.put((batch, ids))
+            if errors:
+                break
+    finally:
+        batches.put(None)
+        thread.join()
+    if errors:
+        raise errors[0]
+
+    counts["unchanged"] = total - counts["added"]
+    # An empty stream (e.g. every file failed to parse) never wipes the store
+    if total:
+        counts["removed"] = _delete(vectorstore, existing - seen_ids)
+    return counts
+
+class OverlayVectorStore(VectorStore):
+    """Read-only shared base index plus a small writable per-session overlay"""
+
+    def __init__(self, base, overlay):
+        self.base = base
+        self.overlay = overlay
+
+    @property
+    def embeddings(self):
+        return self.overlay.embeddings
+
+    # Writes, gets and deletes only ever touch the session's overlay
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        return self.overlay.add_texts(texts, metadatas=metadatas, ids=ids, **kwargs)
+
+    def add_documents(self, documents, **kwargs):
+        return self.overlay.add_documents(documents, **kwargs)
+
+    def delete(self, ids=None, **kwargs):
+        return self.overlay.delete(ids=ids, **kwargs)
+
+    def get(self, *args, **kwargs):
+        return self.overlay.get(*args, **kwargs)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, **kwargs):
+        """Merge top-k from base and overlay (both must return cosine distances)"""
+        results = (
+            self.base.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+            + self.overlay.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+        )
+        return sorted(results, key=lambda pair: pair[1])[:k]
+
+    def distances_by_id(self, ids, embedding):
+        """Cosine distances for stored IDs, looked up in both base and overlay"""
+        distances = self.base.distances_by_id(ids, embedding)
+        distances.update(self.overlay.distances_by_id(ids, embedding))
+        return distances
+
+    def lexical_search(self, query, k=4):
+        """Merge BM25 top-k from base and overlay by rank; scores are RRF scores"""
+        # Raw BM25 scores depend on each index's own IDF and document lengths,
+        # so they are not comparable across the two indexes
+        base = self.base.lexical_search(query, k)
+        overlay = self.overlay.lexical_search(query, k)
+        docs = {doc.id: doc for doc, _ in base + overlay}
+        fused = reciprocal_rank_fusion([[doc.id for doc, _ in base], [doc.id for doc, _ in overlay]])[:k]
+        return [(docs[doc_id], score) for doc_id, score in fused]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector_with_relevance_scores(
+            self.embeddings.embed_query(query), k=k
+        )
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        return lambda distance: 1.0 - distance / 2
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Build the base with build_base_index and wrap a session store")
+
+def build_base_index(chunks, embeddings, path, model_name=DEFAULT_MODEL_NAME):
+    """Embed a shared corpus once and save it for memory-mapped loading"""
+    store = NumpyVectorStore(embeddings)
+    add_documents(store, chunks)
+    store.save(path)
+    with open(os.path.join(path, BASE_META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"model_name": model_name, "chunks": len(store)}, f)
+    return store
+
+_base_indexes = {}
+_base_indexes_lock = threading.Lock()
+
+def load_base_index(path, embeddings, model_name=DEFAULT_MODEL_NAME):
+    """Load a shared base index once per process (vectors stay memory-mapped)"""
+    key = os.path.abspath(path)
+    with _base_indexes_lock:
+        store = _base_indexes.get(key)
+        if store is None:
+            with open(os.path.join(path, BASE_META_FILE), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("model_name") != model_name:
+                raise ValueError(
+                    f"Base index at {path} was built with {meta.get('model_name')}, not {model_name}"
+                )
+            store = NumpyVectorStore.load(path, embeddings, mmap=True)
+            _base_indexes[key] = store
+        return store
+
+def create_session_store(embeddings, persist_directory=None, backend=None):
+    """Empty per-session store, layered over the shared base index when BASE_INDEX_DIR is set"""
+    # Per-session knowledge bases are small, so an in-memory index is the default
+    backend = backend or os.getenv("VECTOR_BACKEND", "numpy")
+    vectorstore = create_vector_store([], embeddings, persist_directory=persist_directory, backend=backend)
+    # Shared base corpus (built once by scripts/build_base_index.py) is
+    # searched alongside the session's own documents
+    base_index_dir = os.getenv("BASE_INDEX_DIR")
+    if base_index_dir and os.path.isdir(base_index_dir) and backend == "numpy":
+        vectorstore = OverlayVectorStore(load_base_index(base_index_dir, embeddings), vectorstore)
+    return vectorstore
+
+@traced("create_vector_store")
+def create_vector_store(chunks, embeddings, persist_directory="db", backend="chroma"):
+    """Create or load vector store (chunks are added or updated in place)"""
+    current_span().set(backend=backend, chunks=len(chunks))
+    # numpy: small in-memory index (loaded from persist_directory if one was saved there)
+    # chroma: persistent on-disk store for large corpora
+    if backend == "numpy":
+        if persist_directory and os.path.exists(os.path.join(persist_directory, VECTORS_FILE)):
+            vectorstore = NumpyVectorStore.load(persist_directory, embeddings)
+            exists = True
+        else:
+            vectorstore = NumpyVectorStore(embeddings)
+            exists = False
+    elif backend == "chroma":
+        # chromadb is only imported when the Chroma backend is used
+        from langchain_community.vectorstores import Chroma
+        exists = os.path.exists(persist_directory)
+        vectorstore = Chroma(
             persist_directory=persist_directory,
             embedding_function=embeddings
         )
     else:
-        # Create new vector store
-        return Chroma.from_documents(
-            documents=chunks,
-            embedding=embeddings,
-            persist_directory=persist_directory
-        )
+        raise ValueError(f"Unsupported vector store backend: {backend}")
+
+    if chunks:
+        if exists:
+            update_documents(vectorstore, chunks)
+        else:
+            add_documents(vectorstore, chunks)
+    return vectorstore
@@ -0,0 +1,144 @@
+"""Summarize per-stage query latencies from the JSONL query logs.
+
+Usage:
+    python scripts/analyze_logs.py
+    python scripts/analyze_logs.py --since 2025-01-01 --log-dir logs --json
+
+Reads logs/queries_*.jsonl (and rotated .jsonl.gz files) and prints
+p50/p95/p99 latencies for each stage (query embedding, vector search,
+prompt assembly, LLM time-to-first-token, LLM total, end-to-end and
+evaluation), overall and per answer mode, plus average token counts,
+similarity scores and the answer cache hit rate.
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = ("embed_ms", "search_ms", "prompt_ms", "llm_ttft_ms", "llm_ms", "total_ms", "evaluation_ms")
+PERCENTILES = (50, 95, 99)
+
+def iter_entries(log_dir, since=None):
+    """Yield logged queries (only those with metrics), oldest file first"""
+    names = sorted(
+        name for name in os.listdir(log_dir)
+        if name.startswith("queries_") and name.endswith((".jsonl", ".jsonl.gz"))
+    )
+    for name in names:
+        path = os.path.join(log_dir, name)
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if not entry.get("metrics"):
+                    continue
+                if since and entry.get("timestamp", "") < since:
+                    continue
+                yield entry
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a sorted list"""
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+class Summary:
+    """Latency samples and counters for one group of queries"""
+
+    def __init__(self):
+        self.count = 0
+        self.cached = 0
+        self.stages = defaultdict(list)
+        self.tokens = defaultdict(int)
+        self.token_queries = 0
+        self.top_scores = []
+
+    def add(self, metrics):
+        self.count += 1
+        self.cached += bool(metrics.get("answer_cached"))
+        timings = {**metrics.get("timings", {})}
+        if "evaluation_ms" in metrics:
+            timings["evaluation_ms"] = metrics["evaluation_ms"]
+        for stage in STAGES:
+            if timings.get(stage) is not None:
+                self.stages[stage].append(timings[stage])
+        usage = metrics.get("usage") or {}
+        if usage.get("input_tokens"):
+            # Providers that report no usage are left out of the averages
+            self.token_queries += 1
+            for field in ("input_tokens", "output_tokens", "cached_tokens"):
+                self.tokens[field] += usage.get(field) or 0
+        if metrics.get("similarity_scores"):
+            self.top_scores.append(max(metrics["similarity_scores"]))
+
+    def result(self):
+        stages = {}
+        for stage in STAGES:
+            values = sorted(self.stages[stage])
+            if values:
+                stages[stage] = {"count": len(values)}
+                stages[stage].update({f"p{pct}": round(percentile(values, pct), 1) for pct in PERCENTILES})
+        return {
+            "queries": self.count,
+            "cache_hit_rate": round(self.cached / self.count, 3) if self.count else 0.0,
+            "stages": stages,
+            "avg_tokens": {
+                field: round(total / self.token_queries, 1) for field, total in self.tokens.items()
+            } if self.token_queries else {},
+            "avg_top_similarity": round(sum(self.top_scores) / len(self.top_scores), 3) if self.top_scores else None,
+        }
+
+def analyze(entries):
+    overall = Summary()
+    by_mode = defaultdict(Summary)
+    for entry in entries:
+        overall.add(entry["metrics"])
+        by_mode[entry.get("answer_mode", "default")].add(entry["metrics"])
+    return {
+        "overall": overall.result(),
+        "by_answer_mode": {mode: summary.result() for mode, summary in sorted(by_mode.items())},
+    }
+
+def print_summary(title, summary):
+    print(f"\n{title}: {summary['queries']} queries, cache hit rate {summary['cache_hit_rate']:.1%}")
+    if summary["avg_top_similarity"] is not None:
+        print(f"  avg top similarity: {summary['avg_top_similarity']:.3f}")
+    if summary["avg_tokens"]:
+        tokens = ", ".join(f"{field} {value:g}" for field, value in summary["avg_tokens"].items())
+        print(f"  avg tokens: {tokens}")
+    print(f"  {'stage':<15} {'n':>6} " + " ".join(f"{f'p{pct} ms':>10}" for pct in PERCENTILES))
+    for stage, stats in summary["stages"].items():
+        row = " ".join(f"{stats[f'p{pct}']:>10.1f}" for pct in PERCENTILES)
+        print(f"  {stage:<15} {stats['count']:>6} {row}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--log-dir", default=os.path.join(ROOT, "logs"))
+    parser.add_argument("--since", help="Only queries logged at or after this ISO date/time")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.log_dir):
+        print(f"No log directory: {args.log_dir}", file=sys.stderr)
+        return 1
+    report = analyze(iter_entries(args.log_dir, args.since))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    if not report["overall"]["queries"]:
+        print("No queries with metrics found")
+        return 0
+    print_summary("All queries", report["overall"])
+    for mode, summary in report["by_answer_mode"].items():
+        print_summary(f"Answer mode '{mode}'", summary)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
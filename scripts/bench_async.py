@@ -0,0 +1,99 @@
+"""Measure QA throughput as concurrent async requests grow, against a fake LLM with injected latency.
+
+Usage:
+    python scripts/bench_async.py --requests 64 --latency-ms 500 --concurrency 1 4 16 64
+
+Retrieval uses the real NumPy index with deterministic fake embeddings, so
+the numbers isolate how well retrieval, generation and evaluation overlap.
+Set LLM_MAX_CONCURRENCY to see the per-provider limiter cap throughput.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from rag.evaluator import aevaluate
+from rag.qa_chain import create_qa_chain
+from rag.vector_store import add_documents, create_vector_store
+
+class LatencyChatModel(BaseChatModel):
+    """Chat model that answers after a fixed delay"""
+
+    latency_ms: float = 500.0
+
+    @property
+    def _llm_type(self):
+        return "latency-fake"
+
+    def _result(self):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(
+            content="SCORE_RELEVANCE: 8\nSCORE_CLARITY: 8\nSCORE_STAR: 7\nFEEDBACK: ✔ Clear.",
+            usage_metadata={"input_tokens": 400, "output_tokens": 20, "total_tokens": 420},
+        ))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency_ms / 1000)
+        return self._result()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._result()
+
+def build_chain(latency_ms, chunks):
+    embeddings = DeterministicFakeEmbedding(size=384)
+    vectorstore = create_vector_store([], embeddings, persist_directory=None, backend="numpy")
+    add_documents(vectorstore, [
+        Document(page_content=f"Interview material chunk {i} about Python, SQL and teamwork.",
+                 metadata={"source": f"doc-{i % 10}"})
+        for i in range(chunks)
+    ])
+    llm = LatencyChatModel(latency_ms=latency_ms)
+    return llm, create_qa_chain(llm, vectorstore, cache=False)
+
+async def run(chain, llm, requests, concurrency, evaluate):
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with gate:
+            question = f"How should I answer question {i}?"
+            result = await chain.acall({"query": question})
+            if evaluate:
+                await aevaluate(llm, question, result["result"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--no-evaluate", action="store_true", help="Answer only, skip evaluation")
+    args = parser.parse_args()
+
+    llm, chain = build_chain(args.latency_ms, args.chunks)
+    calls = 1 if args.no_evaluate else 2
+    print(f"{args.requests} requests, {calls} LLM call(s) each at {args.latency_ms:.0f} ms, "
+          f"LLM_MAX_CONCURRENCY={os.getenv('LLM_MAX_CONCURRENCY', '8')}")
+    print(f"{'concurrency':>11} {'seconds':>8} {'req/s':>8} {'speedup':>8}")
+    baseline = None
+    for concurrency in args.concurrency:
+        seconds = asyncio.run(run(chain, llm, args.requests, concurrency, not args.no_evaluate))
+        throughput = args.requests / seconds
+        baseline = baseline or throughput
+        print(f"{concurrency:>11} {seconds:>8.2f} {throughput:>8.2f} {throughput / baseline:>7.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Compare embedding backends: cosine parity with the reference model and throughput.
+
+Usage:
+    python scripts/bench_embeddings.py --backends torch int8 onnx onnx-int8 --texts 512
+
+Exits with status 1 if any backend's minimum cosine similarity to the
+reference vectors falls below --min-cosine, so it can gate a backend switch.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.embeddings import DEFAULT_MODEL_NAME, EMBEDDING_BACKENDS, compare_backends
+
+SAMPLE_SENTENCES = [
+    "Led a team of five engineers to migrate our payment service to Kubernetes.",
+    "Tell me about a time you disagreed with your manager.",
+    "Experience with Python, FastAPI, PostgreSQL and AWS Lambda is required.",
+    "Reduced monthly cloud costs by 30% by right-sizing EC2 instances.",
+    "Why are you interested in this data analyst role at our company?",
+    "Certified Scrum Master with three years of agile delivery experience.",
+    "Built a real-time dashboard in Power BI used by the executive team.",
+    "Describe a project where you had to learn a new technology quickly.",
+]
+
+def sample_texts(count):
+    """Build a deterministic corpus of interview-style chunks"""
+    return [
+        f"{SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)]} (item {i})"
+        for i in range(count)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    results = compare_backends(sample_texts(args.texts), args.backends, args.model)
+    print(json.dumps(results, indent=2))
+
+    failed = [
+        backend for backend, result in results.items()
+        if result.get("min_cosine", 1.0) < args.min_cosine
+    ]
+    if failed:
+        print(f"Parity below {args.min_cosine}: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
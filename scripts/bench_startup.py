@@ -0,0 +1,75 @@
+"""Measure cold import cost of the app's modules, each in a fresh interpreter.
+
+Usage:
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --modules rag.qa_chain --top 10 --repeat 5
+
+For every module the median wall time of `import <module>` is reported,
+along with the heaviest packages it pulls in (from `python -X importtime`),
+so regressions in startup cost can be tracked over time.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    "rag.loader",
+    "rag.splitter",
+    "rag.embeddings",
+    "rag.vector_store",
+    "rag.qa_chain",
+    "rag.evaluator",
+    "rag.logger",
+    "rag.storage",
+    "rag.sessions",
+]
+
+def import_time(module):
+    """Wall time and per-package cumulative import times (microseconds) for one cold import"""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; "
+        "print(time.perf_counter() - start)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    packages = {}
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nesting is shown as two extra spaces per level; keep the module's direct imports
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            packages[name.strip()] = packages.get(name.strip(), 0) + int(cumulative)
+    return float(result.stdout.strip().splitlines()[-1]), packages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=3, help="Heaviest imported packages to list")
+    args = parser.parse_args()
+
+    print(f"{'module':<20} {'median s':>9}  heaviest imports")
+    for module in args.modules:
+        runs = [import_time(module) for _ in range(args.repeat)]
+        seconds = statistics.median(run[0] for run in runs)
+        packages = runs[-1][1]
+        heaviest = sorted(
+            (item for item in packages.items() if item[0] != module),
+            key=lambda item: item[1], reverse=True,
+        )[:args.top]
+        details = ", ".join(f"{name} {us / 1e6:.2f}s" for name, us in heaviest)
+        print(f"{module:<20} {seconds:>9.2f}  {details}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""Build the shared, read-only base index from a folder of public JDs and question banks.
+
+Usage:
+    python scripts/build_base_index.py corpus/ base_index/
+
+Then set BASE_INDEX_DIR=base_index so every session searches it alongside
+its own documents without re-ingesting them.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.embeddings import DEFAULT_MODEL_NAME, get_embeddings
+from rag.loader import load_documents
+from rag.vector_store import build_base_index
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, files in os.walk(args.corpus_dir)
+        for name in files
+        if name.endswith((".pdf", ".txt"))
+    )
+    chunks = []
+    for loaded in load_documents(paths):
+        if loaded["error"]:
+            print(f"Skipped {loaded['path']}: {loaded['error']}", file=sys.stderr)
+            continue
+        source = os.path.relpath(loaded["path"], args.corpus_dir)
+        for chunk in loaded["chunks"]:
+            chunk.metadata["source"] = f"Base: {source}"
+        chunks.extend(loaded["chunks"])
+
+    store = build_base_index(chunks, get_embeddings(args.model), args.output_dir, args.model)
+    print(f"Indexed {len(store)} chunks from {len(paths)} files into {args.output_dir}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())